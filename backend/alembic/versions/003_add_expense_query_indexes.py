@@ -0,0 +1,53 @@
+"""Add composite indexes for expense query patterns
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so the
+    # indexes are built in autocommit mode to avoid locking writes on a live table
+    with op.get_context().autocommit_block():
+        # Expense list (newest first) and keyset pagination on (date, id)
+        op.create_index(
+            'ix_expenses_user_id_date_id',
+            'expenses',
+            ['user_id', sa.text('date DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        # Category filters, category trends and per-category predictions
+        op.create_index(
+            'ix_expenses_user_id_category_date',
+            'expenses',
+            ['user_id', 'category', 'date'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+        # Top expenses by amount
+        op.create_index(
+            'ix_expenses_user_id_amount',
+            'expenses',
+            ['user_id', sa.text('amount DESC')],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_expenses_user_id_amount', table_name='expenses', postgresql_concurrently=True)
+        op.drop_index('ix_expenses_user_id_category_date', table_name='expenses', postgresql_concurrently=True)
+        op.drop_index('ix_expenses_user_id_date_id', table_name='expenses', postgresql_concurrently=True)
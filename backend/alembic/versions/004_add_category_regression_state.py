@@ -0,0 +1,80 @@
+"""Add per-category regression state table
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reuse the enum type created with the expenses table
+    category = postgresql.ENUM('FOOD', 'TRAVEL', 'ENTERTAINMENT', 'UTILITIES', 'HEALTHCARE', 'SHOPPING', 'EDUCATION', 'OTHER', name='category', create_type=False)
+
+    op.create_table('category_regression_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', category, nullable=False),
+        sa.Column('first_date', sa.DateTime(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('sum_month', sa.Float(), nullable=False),
+        sa.Column('sum_days', sa.Float(), nullable=False),
+        sa.Column('sum_amount', sa.Float(), nullable=False),
+        sa.Column('sum_month_month', sa.Float(), nullable=False),
+        sa.Column('sum_month_days', sa.Float(), nullable=False),
+        sa.Column('sum_month_amount', sa.Float(), nullable=False),
+        sa.Column('sum_days_days', sa.Float(), nullable=False),
+        sa.Column('sum_days_amount', sa.Float(), nullable=False),
+        sa.Column('sum_amount_amount', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'category', name='uq_category_regression_state_user_id_category')
+    )
+    op.create_index(op.f('ix_category_regression_state_id'), 'category_regression_state', ['id'], unique=False)
+
+    # Backfill from the existing expenses with the sums compute_states produces, for
+    # x = (month, whole days since the series' first expense, amount)
+    # (python -m services.regression_state rebuild repairs it later)
+    op.execute("""
+        INSERT INTO category_regression_state (
+            user_id, category, first_date, count,
+            sum_month, sum_days, sum_amount,
+            sum_month_month, sum_month_days, sum_month_amount,
+            sum_days_days, sum_days_amount, sum_amount_amount,
+            updated_at
+        )
+        SELECT user_id, category, MIN(first_date), COUNT(*),
+            SUM(m), SUM(d), SUM(a),
+            SUM(m * m), SUM(m * d), SUM(m * a),
+            SUM(d * d), SUM(d * a), SUM(a * a),
+            now() AT TIME ZONE 'utc'
+        FROM (
+            SELECT user_id, category, first_date,
+                EXTRACT(MONTH FROM date)::double precision AS m,
+                EXTRACT(DAY FROM date - first_date)::double precision AS d,
+                amount::double precision AS a
+            FROM (
+                SELECT user_id, category, date, amount,
+                    MIN(date) OVER (PARTITION BY user_id, category) AS first_date
+                FROM expenses
+                WHERE user_id IS NOT NULL AND date IS NOT NULL
+            ) dated
+        ) features
+        GROUP BY user_id, category
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_category_regression_state_id'), table_name='category_regression_state')
+    op.drop_table('category_regression_state')
@@ -0,0 +1,49 @@
+"""Add model registry and regression state versions
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('category_regression_state', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+
+    # Reuse the enum type created with the expenses table
+    category = postgresql.ENUM('FOOD', 'TRAVEL', 'ENTERTAINMENT', 'UTILITIES', 'HEALTHCARE', 'SHOPPING', 'EDUCATION', 'OTHER', name='category', create_type=False)
+
+    op.create_table('model_registry',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', category, nullable=False),
+        sa.Column('data_version', sa.Integer(), nullable=False),
+        sa.Column('coef', sa.JSON(), nullable=False),
+        sa.Column('intercept', sa.Float(), nullable=False),
+        sa.Column('r2', sa.Float(), nullable=False),
+        sa.Column('first_date', sa.DateTime(), nullable=False),
+        sa.Column('last_date', sa.DateTime(), nullable=False),
+        sa.Column('recent_average', sa.Float(), nullable=False),
+        sa.Column('data_points', sa.Integer(), nullable=False),
+        sa.Column('fitted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'category', name='uq_model_registry_user_id_category')
+    )
+    op.create_index(op.f('ix_model_registry_id'), 'model_registry', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_model_registry_id'), table_name='model_registry')
+    op.drop_table('model_registry')
+    op.drop_column('category_regression_state', 'version')
@@ -0,0 +1,45 @@
+"""Add precomputed predictions table
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reuse the enum type created with the expenses table
+    category = postgresql.ENUM('FOOD', 'TRAVEL', 'ENTERTAINMENT', 'UTILITIES', 'HEALTHCARE', 'SHOPPING', 'EDUCATION', 'OTHER', name='category', create_type=False)
+
+    op.create_table('predictions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', category, nullable=False),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('predicted_overspend', sa.Float(), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=False),
+        sa.Column('data_points', sa.Integer(), nullable=False),
+        sa.Column('prediction', sa.Float(), nullable=True),
+        sa.Column('recent_average', sa.Float(), nullable=True),
+        sa.Column('data_version', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'category', 'mode', name='uq_predictions_user_id_category_mode')
+    )
+    op.create_index(op.f('ix_predictions_id'), 'predictions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_predictions_id'), table_name='predictions')
+    op.drop_table('predictions')
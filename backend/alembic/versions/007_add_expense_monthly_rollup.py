@@ -0,0 +1,50 @@
+"""Add expense monthly rollup table
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reuse the enum type created with the expenses table
+    category = postgresql.ENUM('FOOD', 'TRAVEL', 'ENTERTAINMENT', 'UTILITIES', 'HEALTHCARE', 'SHOPPING', 'EDUCATION', 'OTHER', name='category', create_type=False)
+
+    op.create_table('expense_monthly_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('category', category, nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'year', 'month', 'category', name='uq_expense_monthly_rollup_user_id_year_month_category')
+    )
+    op.create_index(op.f('ix_expense_monthly_rollup_id'), 'expense_monthly_rollup', ['id'], unique=False)
+
+    # Backfill from the existing expenses (python -m services.monthly_rollup rebuild repairs it later)
+    op.execute("""
+        INSERT INTO expense_monthly_rollup (user_id, year, month, category, total, count)
+        SELECT user_id, EXTRACT(YEAR FROM date)::integer, EXTRACT(MONTH FROM date)::integer, category, SUM(amount), COUNT(*)
+        FROM expenses
+        WHERE user_id IS NOT NULL AND date IS NOT NULL
+        GROUP BY user_id, EXTRACT(YEAR FROM date), EXTRACT(MONTH FROM date), category
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_expense_monthly_rollup_id'), table_name='expense_monthly_rollup')
+    op.drop_table('expense_monthly_rollup')
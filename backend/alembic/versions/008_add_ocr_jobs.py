@@ -0,0 +1,44 @@
+"""Add background OCR jobs table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ocr_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('content_type', sa.String(), nullable=False),
+        sa.Column('image', sa.LargeBinary(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ocr_jobs_id'), 'ocr_jobs', ['id'], unique=False)
+    op.create_index('ix_ocr_jobs_status_next_attempt_at', 'ocr_jobs', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ocr_jobs_status_next_attempt_at', table_name='ocr_jobs')
+    op.drop_index(op.f('ix_ocr_jobs_id'), table_name='ocr_jobs')
+    op.drop_table('ocr_jobs')
@@ -0,0 +1,103 @@
+"""
+Offline batch forecasting job
+
+Precomputes overspend predictions for every user and category and upserts
+them into the predictions table, which /expenses/predict serves while fresh.
+Meant to run nightly, e.g. from cron:
+
+    python batch_predict.py --workers 4 --chunk-size 500
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+def predict_chunk(user_ids: List[int], mode: str) -> Tuple[int, int, int]:
+    """
+    Worker: compute and store predictions for a chunk of users
+
+    Returns:
+        Tuple of (users processed, users failed, prediction rows written)
+    """
+    from database import SessionLocal
+    from services.forecasting import ForecastMode
+    from services.prediction_store import compute_and_store
+
+    processed = failed = written = 0
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            try:
+                written += compute_and_store(db, user_id, ForecastMode(mode))
+                db.commit()
+                processed += 1
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                print(f"User {user_id} failed: {e}", file=sys.stderr)
+    finally:
+        db.close()
+    return processed, failed, written
+
+def iter_user_chunks(chunk_size: int) -> Iterator[List[int]]:
+    """Stream user ids in chunks without loading the whole users table"""
+    from database import SessionLocal
+    from models.base import User
+
+    db = SessionLocal()
+    try:
+        chunk = []
+        for (user_id,) in db.query(User.id).order_by(User.id).yield_per(chunk_size):
+            chunk.append(user_id)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        db.close()
+
+def run(mode: str, workers: int, chunk_size: int) -> Tuple[int, int, int]:
+    """Fan the user chunks out over a process pool, keeping a bounded number in flight"""
+    processed = failed = written = 0
+
+    # Spawned workers open their own database connections instead of inheriting ours
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = set()
+        for chunk in iter_user_chunks(chunk_size):
+            pending.add(executor.submit(predict_chunk, chunk, mode))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    p, f, w = future.result()
+                    processed, failed, written = processed + p, failed + f, written + w
+
+        for future in wait(pending).done:
+            p, f, w = future.result()
+            processed, failed, written = processed + p, failed + f, written + w
+
+    return processed, failed, written
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from services.forecasting import FORECAST_MODE, ForecastMode
+
+    parser = argparse.ArgumentParser(description="Precompute overspend predictions for all users")
+    parser.add_argument("--mode", choices=[mode.value for mode in ForecastMode], default=FORECAST_MODE.value, help="forecast mode to precompute")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=500, help="users per worker task")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    processed, failed, written = run(args.mode, args.workers, args.chunk_size)
+    print(
+        f"Predicted {processed} users ({failed} failed), wrote {written} rows "
+        f"in {time.monotonic() - started:.1f}s"
+    )
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark for the serverless handler
+
+Measures, in fresh interpreter processes, how long `import api.index` takes
+and how long the first request through the Mangum handler takes, and fails
+when the median exceeds the budget:
+
+    python benchmarks/cold_start.py --runs 5 --import-budget-ms 2000 --request-budget-ms 500
+
+DATABASE_URL must be set (GET /health does not query the database). Use
+--importtime to list the modules that dominate the import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process: import the handler, then send one API Gateway event through it
+CHILD = """
+import json, time
+started = time.perf_counter()
+import api.index
+imported = time.perf_counter()
+event = {
+    "resource": "/{proxy+}",
+    "path": %(path)r,
+    "httpMethod": "GET",
+    "headers": {"host": "localhost", "accept": "application/json"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "pathParameters": None,
+    "stageVariables": None,
+    "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "path": %(path)r, "stage": "bench"},
+    "body": None,
+    "isBase64Encoded": False,
+}
+response = api.index.handler(event, None)
+finished = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "request_ms": (finished - imported) * 1000,
+    "status": response["statusCode"],
+}))
+"""
+
+def measure(path: str, importtime: bool = False) -> Dict[str, float]:
+    """Import the handler and serve one request in a new interpreter"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD % {"path": path}]
+    # Measure the serverless configuration (NullPool, no prediction process pool) unless overridden
+    env = {**os.environ}
+    env.setdefault("VERCEL", "1")
+    result = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Cold start run failed:\n{result.stderr}")
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    if importtime:
+        measurement["importtime"] = result.stderr
+    return measurement
+
+def slowest_imports(importtime: str, top: int) -> List[tuple]:
+    """Parse -X importtime output into the top (cumulative_ms, module) pairs"""
+    modules = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure serverless cold-start time of the API")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to measure")
+    parser.add_argument("--path", default="/health", help="path of the first request")
+    parser.add_argument("--import-budget-ms", type=float, default=2000, help="budget for the median import time")
+    parser.add_argument("--request-budget-ms", type=float, default=500, help="budget for the median first request")
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must be set")
+
+    runs = [measure(args.path) for _ in range(args.runs)]
+    statuses = {run["status"] for run in runs}
+    import_ms = statistics.median(run["import_ms"] for run in runs)
+    request_ms = statistics.median(run["request_ms"] for run in runs)
+
+    print(f"import api.index: median {import_ms:.0f} ms, max {max(run['import_ms'] for run in runs):.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"first request {args.path}: median {request_ms:.0f} ms, max {max(run['request_ms'] for run in runs):.0f} ms (budget {args.request_budget_ms:.0f} ms)")
+
+    if args.importtime:
+        print("slowest imports (cumulative):")
+        for ms, name in slowest_imports(measure(args.path, importtime=True)["importtime"], 15):
+            print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    if statuses != {200}:
+        print(f"FAIL: first request returned {sorted(statuses)}")
+        failed = True
+    if import_ms > args.import_budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    if request_ms > args.request_budget_ms:
+        print("FAIL: first request over budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Expense list serialization benchmark
+
+Times the two ways of building a GET /expenses/ page: the previous ORM path
+(Expense instances, validated through ExpenseResponse with from_attributes
+and rendered by the default JSON encoder) and the projected path (the
+response columns as plain dicts, rendered by orjson). Reports the cost per
+row of each stage on a seeded SQLite database:
+
+    python benchmarks/expense_list.py --rows 10000 --limit 1000 --repeat 20
+
+Both paths must produce the same JSON; the benchmark fails if they do not.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+def seed(db, user_id: int, rows: int) -> None:
+    from sqlalchemy import insert
+
+    from models.base import Category, Expense
+
+    categories = list(Category)
+    start = datetime(2024, 1, 1)
+    db.execute(insert(Expense.__table__), [
+        {
+            "user_id": user_id,
+            "amount": round(5 + (i * 37 % 9000) / 100, 2),
+            "category": categories[i % len(categories)],
+            "date": start + timedelta(minutes=17 * i),
+            "notes": f"Receipt {i}" if i % 3 else None,
+            "receipt_url": None,
+            "created_at": start + timedelta(minutes=17 * i, seconds=5)
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+def orm_page(session_factory, user_id: int, limit: int) -> Tuple[List[Any], bytes, float]:
+    """Previous path; returns the page, its body and the seconds spent loading it"""
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from crud.expenses import expense_crud
+    from routers.expenses import ExpenseResponse
+
+    adapter = TypeAdapter(List[ExpenseResponse])
+    with session_factory() as db:
+        started = time.perf_counter()
+        expenses = expense_crud.get_user_expenses(db, user_id, limit=limit)
+        loaded = time.perf_counter() - started
+        # What FastAPI does with a response_model: validate, dump to JSON types, json.dumps
+        body = JSONResponse(adapter.dump_python(adapter.validate_python(expenses, from_attributes=True), mode="json")).body
+    return expenses, body, loaded
+
+def row_page(session_factory, user_id: int, limit: int) -> Tuple[List[Any], bytes, float]:
+    """Projected path; returns the page, its body and the seconds spent loading it"""
+    from fastapi.responses import ORJSONResponse
+
+    from crud.expenses import expense_crud
+
+    with session_factory() as db:
+        started = time.perf_counter()
+        rows = expense_crud.get_user_expense_rows(db, user_id, limit=limit)
+        loaded = time.perf_counter() - started
+        body = ORJSONResponse(rows).body
+    return rows, body, loaded
+
+PATHS: Dict[str, Callable] = {"orm": orm_page, "rows": row_page}
+
+def measure(page: Callable, session_factory, user_id: int, limit: int, repeat: int) -> Dict[str, float]:
+    """Median microseconds per row to load a page, to serialize it, and in total"""
+    loads, totals = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows, _, loaded = page(session_factory, user_id, limit)
+        totals.append((time.perf_counter() - started) / len(rows))
+        loads.append(loaded / len(rows))
+    load = statistics.median(loads) * 1e6
+    total = statistics.median(totals) * 1e6
+    return {"load": load, "serialize": total - load, "total": total}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the per-row cost of the ORM and projected expense list paths")
+    parser.add_argument("--rows", type=int, default=10000, help="expenses seeded for the user")
+    parser.add_argument("--limit", type=int, default=1000, help="page size")
+    parser.add_argument("--repeat", type=int, default=20, help="pages timed per path")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "expense_list.db")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{path}")
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from models.base import Base, User
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        user = User(email="bench@example.com", first_name="Bench", last_name="Mark")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        seed(db, user_id, args.rows)
+
+    bodies = {name: page(session_factory, user_id, args.limit)[1] for name, page in PATHS.items()}
+    if json.loads(bodies["orm"]) != json.loads(bodies["rows"]):
+        print("FAIL: the projected path renders a different page than the ORM path")
+        return 1
+
+    results = {name: measure(page, session_factory, user_id, args.limit, args.repeat) for name, page in PATHS.items()}
+    for name, cost in results.items():
+        print(f"{name:>5}: load {cost['load']:6.2f} us/row, serialize {cost['serialize']:6.2f} us/row, total {cost['total']:6.2f} us/row")
+    print(f"speedup: {results['orm']['total'] / results['rows']['total']:.1f}x per row at limit={args.limit}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
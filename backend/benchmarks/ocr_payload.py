@@ -0,0 +1,125 @@
+"""
+Receipt image normalization benchmark
+
+Normalizes every image in a directory of sample receipts and reports the bytes
+that would be sent to the OCR provider (base64, as the providers receive them)
+before and after normalization:
+
+    python benchmarks/ocr_payload.py samples/receipts
+
+With --extract, each receipt is also sent to the configured provider both as
+uploaded and normalized, and the extracted amount and category are compared
+with the expected values in the directory's labels.json:
+
+    {"coffee.jpg": {"amount": 4.5, "category": "food"}, ...}
+
+--extract makes two paid provider calls per image and bypasses the OCR cache.
+OCR_IMAGE_MAX_DIMENSION, OCR_IMAGE_JPEG_QUALITY and OCR_IMAGE_GRAYSCALE apply
+as in the API.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services import image_preprocessing, ocr_service
+
+IMAGE_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+def base64_size(size: int) -> int:
+    """Bytes of the base64 encoding of size bytes"""
+    return 4 * ((size + 2) // 3)
+
+def is_correct(result: Dict[str, Any], expected: Dict[str, Any]) -> Dict[str, bool]:
+    """Compare an extraction with the labelled amount and category"""
+    try:
+        amount = float(result.get("amount", 0.0))
+    except (TypeError, ValueError):
+        amount = 0.0
+    return {
+        "amount": abs(amount - float(expected["amount"])) < 0.01,
+        "category": result.get("category") == expected.get("category")
+    }
+
+async def extract(service: str, image: bytes, content_type: str) -> Dict[str, Any]:
+    try:
+        return await ocr_service.extract_with_service(service, image, content_type) or {}
+    except Exception as e:
+        print(f"  extraction failed: {e}")
+        return {}
+
+async def run(directory: str, extract_results: bool) -> List[Dict[str, Any]]:
+    labels_path = os.path.join(directory, "labels.json")
+    labels = {}
+    if os.path.exists(labels_path):
+        with open(labels_path) as f:
+            labels = json.load(f)
+    service = ocr_service.get_available_service()
+
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        content_type = IMAGE_TYPES.get(os.path.splitext(name)[1].lower())
+        if content_type is None:
+            continue
+        with open(os.path.join(directory, name), "rb") as f:
+            image = f.read()
+
+        started = time.perf_counter()
+        normalized = image_preprocessing.normalize_image(image, content_type)
+        row = {
+            "name": name,
+            "raw_bytes": base64_size(len(image)),
+            "sent_bytes": base64_size(len(normalized.data)),
+            "normalize_ms": (time.perf_counter() - started) * 1000
+        }
+        print(f"{name}: {row['raw_bytes']:,} -> {row['sent_bytes']:,} bytes "
+              f"({row['raw_bytes'] / row['sent_bytes']:.1f}x) in {row['normalize_ms']:.0f} ms")
+
+        if extract_results and name in labels:
+            raw_result = await extract(service, image, content_type)
+            sent_result = await extract(service, normalized.data, normalized.content_type)
+            row["raw_correct"] = is_correct(raw_result, labels[name])
+            row["sent_correct"] = is_correct(sent_result, labels[name])
+        rows.append(row)
+
+    await ocr_service.close_client()
+    return rows
+
+def accuracy(rows: List[Dict[str, Any]], column: str, field: str) -> float:
+    return sum(row[column][field] for row in rows) / len(rows)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure OCR payload size and accuracy with image normalization")
+    parser.add_argument("directory", help="directory of sample receipt images (and an optional labels.json)")
+    parser.add_argument("--extract", action="store_true", help="also call the OCR provider and score the results")
+    args = parser.parse_args(argv)
+
+    if args.extract and not ocr_service.get_available_service():
+        parser.error("--extract needs an OCR provider API key")
+
+    rows = asyncio.run(run(args.directory, args.extract))
+    if not rows:
+        parser.error(f"no images in {args.directory}")
+
+    raw_total = sum(row["raw_bytes"] for row in rows)
+    sent_total = sum(row["sent_bytes"] for row in rows)
+    print(f"\n{len(rows)} images, settings {image_preprocessing.settings_tag()}")
+    print(f"bytes sent: {raw_total:,} -> {sent_total:,} ({raw_total / sent_total:.1f}x smaller)")
+    print(f"normalize time: median {statistics.median(row['normalize_ms'] for row in rows):.0f} ms")
+
+    scored = [row for row in rows if "raw_correct" in row]
+    if scored:
+        for field in ("amount", "category"):
+            print(f"{field} accuracy: {accuracy(scored, 'raw_correct', field):.0%} as uploaded, "
+                  f"{accuracy(scored, 'sent_correct', field):.0%} normalized ({len(scored)} labelled)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Receipt text analyzer benchmark
+
+Runs the amount and category extraction of services/receipt_text.py over the
+labelled receipt texts in benchmarks/fixtures/receipt_texts.json and reports
+accuracy and throughput, next to the regex-and-substring implementation it
+replaced. Fails when accuracy drops below the threshold:
+
+    python benchmarks/receipt_text.py --repeat 200 --min-accuracy 0.9
+
+Add a receipt whenever an extraction goes wrong in production, with the
+amount and category it should have produced.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services import receipt_text
+
+FIXTURES = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "receipt_texts.json")
+
+def legacy_extract_amount(text: str) -> float:
+    """Previous implementation: the first match of four patterns compiled per call"""
+    amount_patterns = [
+        r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',
+        r'(\d+(?:\.\d{2})?)\s*(?:USD|dollars?)',
+        r'total[:\s]*\$?(\d+(?:\.\d{2})?)',
+        r'amount[:\s]*\$?(\d+(?:\.\d{2})?)',
+    ]
+    for pattern in amount_patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            try:
+                return float(matches[0].replace(',', ''))
+            except ValueError:
+                continue
+    return 0.0
+
+def legacy_categorize_expense(text: str) -> str:
+    """Previous implementation: the first category with any keyword as a substring"""
+    text_lower = text.lower()
+    categories = {
+        "food": ["restaurant", "food", "dining", "meal", "lunch", "dinner", "breakfast", "cafe", "coffee", "pizza", "burger"],
+        "travel": ["hotel", "flight", "airline", "taxi", "uber", "lyft", "rental car", "gas", "parking", "airport"],
+        "entertainment": ["movie", "theater", "concert", "show", "ticket", "netflix", "spotify", "game"],
+        "shopping": ["store", "retail", "clothing", "shoes", "electronics", "amazon", "walmart", "target"],
+        "healthcare": ["pharmacy", "medical", "doctor", "hospital", "clinic", "medicine", "health"],
+        "utilities": ["electric", "water", "gas", "internet", "phone", "cable", "utility"],
+        "education": ["book", "course", "tuition", "school", "university", "education"]
+    }
+    for category, keywords in categories.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                return category
+    return "other"
+
+IMPLEMENTATIONS = {
+    "legacy": (legacy_extract_amount, legacy_categorize_expense),
+    "analyzer": (receipt_text.extract_amount, receipt_text.categorize_expense)
+}
+
+def accuracy(receipts: List[Dict[str, Any]], amount_fn: Callable, category_fn: Callable, verbose: bool) -> Dict[str, float]:
+    amounts = categories = 0
+    for receipt in receipts:
+        amount = amount_fn(receipt["text"])
+        category = category_fn(receipt["text"])
+        amount_ok = abs(amount - receipt["amount"]) < 0.01
+        category_ok = category == receipt["category"]
+        amounts += amount_ok
+        categories += category_ok
+        if verbose and not (amount_ok and category_ok):
+            print(f"  {receipt['name']}: got {amount} {category}, expected {receipt['amount']} {receipt['category']}")
+    return {"amount": amounts / len(receipts), "category": categories / len(receipts)}
+
+def throughput(receipts: List[Dict[str, Any]], amount_fn: Callable, category_fn: Callable, repeat: int) -> float:
+    """Receipts analyzed per second"""
+    texts = [receipt["text"] for receipt in receipts]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            amount_fn(text)
+            category_fn(text)
+    return repeat * len(texts) / (time.perf_counter() - started)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure receipt text extraction accuracy and throughput")
+    parser.add_argument("--fixtures", default=FIXTURES, help="labelled receipt texts (JSON)")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the fixtures for the throughput")
+    parser.add_argument("--min-accuracy", type=float, default=0.9, help="fail below this amount or category accuracy")
+    parser.add_argument("--verbose", action="store_true", help="list the receipts the analyzer gets wrong")
+    args = parser.parse_args(argv)
+
+    with open(args.fixtures) as f:
+        receipts = json.load(f)
+
+    results = {}
+    for name, (amount_fn, category_fn) in IMPLEMENTATIONS.items():
+        scores = accuracy(receipts, amount_fn, category_fn, args.verbose and name == "analyzer")
+        rate = throughput(receipts, amount_fn, category_fn, args.repeat)
+        results[name] = scores
+        print(f"{name:>8}: amount {scores['amount']:.0%}, category {scores['category']:.0%}, {rate:,.0f} receipts/s")
+
+    analyzer = results["analyzer"]
+    if min(analyzer.values()) < args.min_accuracy:
+        print(f"FAIL: analyzer accuracy below {args.min_accuracy:.0%} on {len(receipts)} receipts")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
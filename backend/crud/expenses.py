@@ -1,8 +1,64 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, delete, select, tuple_, update
 from datetime import datetime, timedelta
-from typing import List, Optional
-from ..models.base import Expense, User, Category
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import base64
+import json
+from models.base import Expense, ExpenseMonthlyRollup, User, Category
+from services.expense_changes import ExpenseSnapshot, record_expense_change, record_expense_changes, snapshot
+
+def encode_cursor(expense_date: datetime, expense_id: int) -> str:
+    """Encode a (date, id) position in the expense list as an opaque cursor"""
+    raw = json.dumps([expense_date.isoformat(), expense_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_str, expense_id = json.loads(raw)
+        return datetime.fromisoformat(date_str), int(expense_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def selection_filter(
+    user_id: int,
+    ids: Optional[Sequence[int]] = None,
+    category: Optional[Category] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> list:
+    """WHERE conditions selecting a user's expenses by id list and/or category and date range"""
+    conditions = [Expense.user_id == user_id]
+    if ids is not None:
+        conditions.append(Expense.id.in_(ids))
+    if category:
+        conditions.append(Expense.category == category)
+    if start_date:
+        conditions.append(Expense.date >= start_date)
+    if end_date:
+        conditions.append(Expense.date <= end_date)
+    return conditions
+
+def page_filter(
+    user_id: int,
+    category: Optional[Category] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None
+) -> list:
+    """WHERE conditions of an expense list page; a cursor seeks past the (date, id) it encodes"""
+    conditions = selection_filter(user_id, category=category, start_date=start_date, end_date=end_date)
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        conditions.append(tuple_(Expense.date, Expense.id) < tuple_(cursor_date, cursor_id))
+    return conditions
+
+# Columns of an expense in list responses, in ExpenseResponse order
+LIST_COLUMNS = (
+    Expense.id, Expense.amount, Expense.category, Expense.date,
+    Expense.notes, Expense.receipt_url, Expense.created_at
+)
 
 class ExpenseCRUD:
     """CRUD operations for expenses"""
@@ -13,11 +69,12 @@ class ExpenseCRUD:
             user_id=user_id,
             amount=expense_data["amount"],
             category=expense_data["category"],
-            date=expense_data.get("date", datetime.utcnow()),
+            date=expense_data.get("date") or datetime.utcnow(),
             notes=expense_data.get("notes"),
             receipt_url=expense_data.get("receipt_url")
         )
         db.add(db_expense)
+        record_expense_change(db, user_id, new=snapshot(db_expense))
         db.commit()
         db.refresh(db_expense)
         return db_expense
@@ -36,21 +93,47 @@ class ExpenseCRUD:
         limit: int = 100,
         category: Optional[Category] = None,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None
     ) -> List[Expense]:
-        """Get expenses for a user with optional filters"""
-        query = db.query(Expense).filter(Expense.user_id == user_id)
-        
-        if category:
-            query = query.filter(Expense.category == category)
+        """
+        Get expenses for a user with optional filters, newest first
         
-        if start_date:
-            query = query.filter(Expense.date >= start_date)
+        When a cursor is given, the page starts right after the (date, id)
+        position it encodes and skip is ignored. The seek uses the
+        (user_id, date DESC, id DESC) index, so every page costs the same.
+        """
+        query = db.query(Expense).filter(*page_filter(user_id, category, start_date, end_date, cursor))
+        if skip and not cursor:
+            query = query.offset(skip)
         
-        if end_date:
-            query = query.filter(Expense.date <= end_date)
+        return query.order_by(Expense.date.desc(), Expense.id.desc()).limit(limit).all()
+    
+    def get_user_expense_rows(
+        self,
+        db: Session,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        category: Optional[Category] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The page get_user_expenses returns, as plain dicts of the LIST_COLUMNS
+
+        Selecting columns instead of entities skips building ORM instances
+        and registering them in the identity map, and the dicts can be
+        serialized as they are, without a response model.
+        """
+        query = select(*LIST_COLUMNS).where(*page_filter(user_id, category, start_date, end_date, cursor))
+        if skip and not cursor:
+            query = query.offset(skip)
         
-        return query.order_by(Expense.date.desc()).offset(skip).limit(limit).all()
+        result = db.execute(query.order_by(Expense.date.desc(), Expense.id.desc()).limit(limit))
+        keys = list(result.keys())
+        return [dict(zip(keys, row)) for row in result]
     
     def update(self, db: Session, user_id: int, expense_id: int, expense_data: dict) -> Optional[Expense]:
         """Update an expense"""
@@ -58,11 +141,14 @@ class ExpenseCRUD:
         if not db_expense:
             return None
         
+        old = snapshot(db_expense)
+        
         # Update fields
         for key, value in expense_data.items():
             if hasattr(db_expense, key) and key != "id" and key != "user_id":
                 setattr(db_expense, key, value)
         
+        record_expense_change(db, user_id, old=old, new=snapshot(db_expense))
         db.commit()
         db.refresh(db_expense)
         return db_expense
@@ -74,29 +160,71 @@ class ExpenseCRUD:
             return False
         
         db.delete(db_expense)
+        record_expense_change(db, user_id, old=snapshot(db_expense))
         db.commit()
         return True
     
-    def get_monthly_summary(self, db: Session, user_id: int, year: int, month: int) -> dict:
-        """Get monthly expense summary by category"""
-        start_date = datetime(year, month, 1)
-        if month == 12:
-            end_date = datetime(year + 1, 1, 1)
+    def bulk_update(self, db: Session, user_id: int, conditions: list, values: Dict[str, Any]) -> int:
+        """
+        Update every expense matching conditions with one UPDATE statement and commit
+
+        On PostgreSQL the UPDATE joins a snapshot of the matched rows, so
+        RETURNING gives each row's old (category, date, amount), which the
+        derived tables need, without a separate SELECT round trip. SQLite
+        evaluates RETURNING after the update, joined columns included, so
+        there the old values are selected first.
+
+        Args:
+            db: Database session
+            user_id: Owner of the expenses
+            conditions: WHERE conditions from selection_filter
+            values: Column values to set
+
+        Returns:
+            Number of updated expenses
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            old = select(Expense.id, Expense.category, Expense.date, Expense.amount).where(*conditions).subquery()
+            changed = db.execute(
+                update(Expense)
+                .where(Expense.id == old.c.id)
+                .values(**values)
+                .returning(old.c.category, old.c.date, old.c.amount),
+                execution_options={"synchronize_session": False}
+            ).all()
         else:
-            end_date = datetime(year, month + 1, 1)
-        
+            changed = db.execute(select(Expense.category, Expense.date, Expense.amount).where(*conditions)).all()
+            db.execute(update(Expense).where(*conditions).values(**values), execution_options={"synchronize_session": False})
+        new_fields = {field: values[field] for field in ExpenseSnapshot._fields if field in values}
+        record_expense_changes(db, user_id, [
+            (ExpenseSnapshot(*row), ExpenseSnapshot(*row)._replace(**new_fields)) for row in changed
+        ])
+        db.commit()
+        return len(changed)
+    
+    def bulk_delete(self, db: Session, user_id: int, conditions: list) -> int:
+        """Delete every expense matching conditions with one DELETE statement and commit"""
+        deleted = db.execute(
+            delete(Expense).where(*conditions).returning(Expense.category, Expense.date, Expense.amount),
+            execution_options={"synchronize_session": False}
+        ).all()
+        record_expense_changes(db, user_id, [(ExpenseSnapshot(*row), None) for row in deleted])
+        db.commit()
+        return len(deleted)
+    
+    def get_monthly_summary(self, db: Session, user_id: int, year: int, month: int) -> dict:
+        """Get monthly expense summary by category (at most one rollup row per category)"""
         summary = db.query(
-            Expense.category,
-            func.sum(Expense.amount).label('total'),
-            func.count(Expense.id).label('count'),
-            func.avg(Expense.amount).label('average')
+            ExpenseMonthlyRollup.category,
+            ExpenseMonthlyRollup.total,
+            ExpenseMonthlyRollup.count
         ).filter(
             and_(
-                Expense.user_id == user_id,
-                Expense.date >= start_date,
-                Expense.date < end_date
+                ExpenseMonthlyRollup.user_id == user_id,
+                ExpenseMonthlyRollup.year == year,
+                ExpenseMonthlyRollup.month == month
             )
-        ).group_by(Expense.category).all()
+        ).all()
         
         return {
             "year": year,
@@ -106,37 +234,33 @@ class ExpenseCRUD:
                     "category": cat,
                     "total": float(total),
                     "count": count,
-                    "average": float(average)
+                    "average": float(total) / count
                 }
-                for cat, total, count, average in summary
+                for cat, total, count in summary
             ],
-            "grand_total": sum(float(total) for _, total, _, _ in summary)
+            "grand_total": sum(float(total) for _, total, _ in summary)
         }
     
     def get_yearly_summary(self, db: Session, user_id: int, year: int) -> dict:
-        """Get yearly expense summary by month"""
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year + 1, 1, 1)
-        
+        """Get yearly expense summary by month (aggregates at most 12 rollup rows per category)"""
         monthly_data = db.query(
-            func.date_trunc('month', Expense.date).label('month'),
-            func.sum(Expense.amount).label('total'),
-            func.count(Expense.id).label('count')
+            ExpenseMonthlyRollup.month,
+            func.sum(ExpenseMonthlyRollup.total).label('total'),
+            func.sum(ExpenseMonthlyRollup.count).label('count')
         ).filter(
             and_(
-                Expense.user_id == user_id,
-                Expense.date >= start_date,
-                Expense.date < end_date
+                ExpenseMonthlyRollup.user_id == user_id,
+                ExpenseMonthlyRollup.year == year
             )
-        ).group_by(func.date_trunc('month', Expense.date)).all()
+        ).group_by(ExpenseMonthlyRollup.month).order_by(ExpenseMonthlyRollup.month).all()
         
         return {
             "year": year,
             "months": [
                 {
-                    "month": month.month,
+                    "month": month,
                     "total": float(total),
-                    "count": count
+                    "count": int(count)
                 }
                 for month, total, count in monthly_data
             ],
@@ -1,17 +1,119 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+from typing import Any, Dict, Optional, Tuple, Union
 from models.base import Base
+import logging
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-engine = create_engine(DATABASE_URL)
+# Connection pooling presets:
+#   server     - long-running uvicorn workers keep a pool of warm connections
+#   serverless - Vercel/Mangum invocations open a connection per checkout (NullPool)
+#                and rely on an external pooler such as PgBouncer or Neon's pooled endpoint
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "serverless" if os.getenv("VERCEL") else "server")
+if DB_POOL_MODE not in ("server", "serverless"):
+    raise ValueError(f"DB_POOL_MODE must be 'server' or 'serverless', not {DB_POOL_MODE!r}")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Checkouts slower than this many seconds are logged as a sign of pool exhaustion
+DB_POOL_SLOW_CHECKOUT = float(os.getenv("DB_POOL_SLOW_CHECKOUT", "0.1"))
+
+class MonitoredPoolMixin:
+    """Counts checkouts and the time spent waiting for a connection"""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._slow_checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            logger.error("Database pool exhausted: %s", self.status())
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                if waited >= DB_POOL_SLOW_CHECKOUT:
+                    self._slow_checkouts += 1
+            if waited >= DB_POOL_SLOW_CHECKOUT:
+                logger.warning("Waited %.3fs for a database connection: %s", waited, self.status())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "idle": self.checkedin(),
+                # Negative while the pool has not yet opened size connections
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": self._checkouts,
+                "slow_checkouts": self._slow_checkouts,
+                "timeouts": self._timeouts,
+                "wait_avg_ms": round(1000 * self._wait_total / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(1000 * self._wait_max, 3)
+            }
+
+class MonitoredQueuePool(MonitoredPoolMixin, QueuePool):
+    pass
+
+class MonitoredAsyncQueuePool(MonitoredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url: Union[str, URL], asynchronous: bool = False) -> Dict[str, Any]:
+    """Pool keyword arguments for create_engine according to DB_POOL_MODE"""
+    if DB_POOL_MODE == "serverless":
+        return {"poolclass": NullPool}
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite picks its own pool; connections are local files, nothing to tune
+        return {}
+    return {
+        "poolclass": MonitoredAsyncQueuePool if asynchronous else MonitoredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+def pool_stats(pool: Pool) -> Dict[str, Any]:
+    """Connection counts and checkout wait times of an engine's pool"""
+    if isinstance(pool, MonitoredPoolMixin):
+        return {"mode": DB_POOL_MODE, **pool.stats()}
+    return {"mode": DB_POOL_MODE, "pool": type(pool).__name__}
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create all tables (for development - in production use Alembic migrations)
-Base.metadata.create_all(bind=engine)
+# Creating tables at import opens a connection and inspects the schema on every
+# (serverless) cold start, so it is opt-in for development; use Alembic migrations otherwise
+if os.getenv("DB_CREATE_ALL", "false").lower() == "true":
+    Base.metadata.create_all(bind=engine)
 
 def get_db():
     """Dependency to get database session"""
@@ -20,3 +122,56 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async engine for the async routes, created on first use so scripts that only
+# need the sync engine do not import the async drivers
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+_async_engine: Optional[AsyncEngine] = None
+
+def async_database_url(url: str) -> Tuple[URL, dict]:
+    """
+    Map a sync database URL to its async driver (asyncpg, aiosqlite)
+
+    Returns:
+        Tuple of (async URL, connect_args for the driver)
+    """
+    url = make_url(url)
+    connect_args = {}
+    if url.get_backend_name() == "postgresql":
+        # asyncpg does not understand libpq's query parameters
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url, connect_args
+
+def get_async_engine() -> AsyncEngine:
+    """Return the shared async engine (ASYNC_DATABASE_URL or derived from DATABASE_URL)"""
+    global _async_engine
+    if _async_engine is None:
+        url, connect_args = async_database_url(os.getenv("ASYNC_DATABASE_URL", DATABASE_URL))
+        _async_engine = create_async_engine(url, connect_args=connect_args, **engine_options(url, asynchronous=True))
+    return _async_engine
+
+async def dispose_async_engine() -> None:
+    """Close the async engine's connections"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+def database_stats() -> Dict[str, Any]:
+    """Pool metrics of the sync and (once used) async engines"""
+    stats = {"sync": pool_stats(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = pool_stats(_async_engine.pool)
+    return stats
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
@@ -1,21 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import anyio
 import os
+import secrets
 from contextlib import asynccontextmanager
 
-from database import get_db
+from database import database_stats, dispose_async_engine, get_db
 from routers import auth, expenses, ocr
 from models.base import Base
+from services import compute_pool, model_registry, ocr_cache, ocr_jobs, ocr_service, user_cache
+
+# Worker threads for sync routes and blocking calls (the predict routes' database work);
+# the async routes run on the event loop and do not need them
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "40"))
+# Bearer token required by GET /metrics; the endpoint does not exist while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 # Application lifecycle
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Starting AI Expense Tracker API...")
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    compute_pool.start()
+    ocr_jobs.start()
     yield
     # Shutdown
     print("Shutting down AI Expense Tracker API...")
+    compute_pool.shutdown()
+    await ocr_jobs.shutdown()
+    await ocr_service.close_client()
+    await dispose_async_engine()
 
 # Create FastAPI app
 app = FastAPI(
@@ -33,8 +49,9 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Content-Disposition"],
 )
 
 # Include routers
@@ -52,6 +69,25 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# Runtime metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str = Header("")):
+    """Cache and worker pool counters of this process (needs METRICS_TOKEN as a bearer token)"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return {
+        "database": database_stats(),
+        "token_cache": auth.token_cache.stats(),
+        "user_cache": user_cache.cache_stats(),
+        "model_cache": model_registry.cache_stats(),
+        "prediction_pool": compute_pool.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "ocr_jobs": await ocr_jobs.stats()
+    }
+
 # Root endpoint
 @app.get("/")
 async def root():
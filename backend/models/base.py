@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index, UniqueConstraint, JSON, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -44,3 +44,122 @@ class Expense(Base):
     
     # Relationship with user
     user = relationship("User", back_populates="expenses")
+
+class CategoryRegressionState(Base):
+    """
+    Running sufficient statistics of the overspend regression for one
+    (user, category) series, kept in sync with every expense write.
+    
+    Features are x = (month, days since first_date, amount) and the target is
+    the amount, so Xᵀy and yᵀy are the amount column of XᵀX.
+    """
+    __tablename__ = "category_regression_state"
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_category_regression_state_user_id_category"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category = Column(Enum(Category), nullable=False)
+    first_date = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    
+    # Xᵀ1
+    sum_month = Column(Float, nullable=False, default=0.0)
+    sum_days = Column(Float, nullable=False, default=0.0)
+    sum_amount = Column(Float, nullable=False, default=0.0)
+    
+    # Upper triangle of XᵀX
+    sum_month_month = Column(Float, nullable=False, default=0.0)
+    sum_month_days = Column(Float, nullable=False, default=0.0)
+    sum_month_amount = Column(Float, nullable=False, default=0.0)
+    sum_days_days = Column(Float, nullable=False, default=0.0)
+    sum_days_amount = Column(Float, nullable=False, default=0.0)
+    sum_amount_amount = Column(Float, nullable=False, default=0.0)
+    
+    # Incremented on every change to the series, keys the model registry
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ModelRegistryEntry(Base):
+    """Latest fitted overspend model of a (user, category) series and its data version"""
+    __tablename__ = "model_registry"
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_model_registry_user_id_category"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category = Column(Enum(Category), nullable=False)
+    data_version = Column(Integer, nullable=False)
+    coef = Column(JSON, nullable=False)
+    intercept = Column(Float, nullable=False)
+    r2 = Column(Float, nullable=False)
+    first_date = Column(DateTime, nullable=False)
+    last_date = Column(DateTime, nullable=False)
+    recent_average = Column(Float, nullable=False)
+    data_points = Column(Integer, nullable=False)
+    fitted_at = Column(DateTime, default=datetime.utcnow)
+
+class Prediction(Base):
+    """Precomputed overspend prediction written by the offline batch job (batch_predict.py)"""
+    __tablename__ = "predictions"
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", "mode", name="uq_predictions_user_id_category_mode"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category = Column(Enum(Category), nullable=False)
+    mode = Column(String, nullable=False)
+    predicted_overspend = Column(Float, nullable=False)
+    confidence = Column(Float, nullable=False)
+    data_points = Column(Integer, nullable=False)
+    prediction = Column(Float, nullable=True)
+    recent_average = Column(Float, nullable=True)
+    # Regression state version of the series when the prediction was computed
+    data_version = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class ExpenseMonthlyRollup(Base):
+    """Total and count of a user's expenses per (year, month, category), kept in sync with every expense write"""
+    __tablename__ = "expense_monthly_rollup"
+    __table_args__ = (
+        UniqueConstraint("user_id", "year", "month", "category", name="uq_expense_monthly_rollup_user_id_year_month_category"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category = Column(Enum(Category), nullable=False)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class OCRJob(Base):
+    """Receipt queued for background OCR (services/ocr_jobs.py); the image is dropped once the job ends"""
+    __tablename__ = "ocr_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # queued, running, succeeded or failed
+    status = Column(String, nullable=False, default="queued")
+    filename = Column(String, nullable=True)
+    content_type = Column(String, nullable=False)
+    image = Column(LargeBinary, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # A queued job is not claimed before this time (retry backoff)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# Composite indexes for the hot expense queries (see alembic revision 003)
+Index("ix_expenses_user_id_date_id", Expense.user_id, Expense.date.desc(), Expense.id.desc())
+Index("ix_expenses_user_id_category_date", Expense.user_id, Expense.category, Expense.date)
+Index("ix_expenses_user_id_amount", Expense.user_id, Expense.amount.desc())
+
+# Workers claim the oldest due job of a status (see alembic revision 008)
+Index("ix_ocr_jobs_status_next_attempt_at", OCRJob.status, OCRJob.next_attempt_at)
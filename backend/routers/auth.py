@@ -1,21 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel, EmailStr
+import hashlib
 import os
+import time
 
-from database import get_db
+from database import get_async_db
 from models.base import User
+from services import user_cache
+from services.cache import LRUCache
 
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Verified token claims kept in memory, keyed by the SHA-256 of the token
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+
 # Password hashing
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -66,21 +76,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token and return its claims, raising JWTError if invalid
+
+    Verified claims are cached until the token's exp, so repeated requests
+    with the same bearer token skip the signature check and JSON parsing.
+    Only the token's hash is used as the key.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
+    
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Tokens without an expiry are verified every time
+    if isinstance(payload.get("exp"), (int, float)):
+        ttl = payload["exp"] - time.time()
+        if ttl > 0:
+            token_cache.set(key, payload, ttl=ttl)
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    # Cached per subject, so most requests never query the users table
+    user = await user_cache.get_user(db, email)
     if user is None:
         raise credentials_exception
     return user
@@ -89,17 +121,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user (hashing is CPU-bound, keep it off the event loop)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = User(
         email=user.email,
         first_name=user.first_name,
@@ -108,16 +140,16 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # Authenticate user
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -133,5 +165,5 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 
-from database import get_db
+from database import get_async_db, get_db
 from models.base import Expense, User, Category
+from crud.expenses import expense_crud, encode_cursor, selection_filter
+from services import expense_export, expense_import
+from services.expense_export import ExportFormat
+from services.expense_changes import naive_utc, record_expense_change, snapshot
+from services.compute_pool import PoolSaturated
+from services.forecasting import ForecastMode
 from routers.auth import get_current_user
 
 # Pydantic models
@@ -17,6 +26,12 @@ class ExpenseCreate(BaseModel):
     notes: Optional[str] = None
     receipt_url: Optional[str] = None
 
+    @field_validator("date")
+    @classmethod
+    def naive_utc_date(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # The frontend sends dates with a UTC offset (toISOString)
+        return naive_utc(value)
+
 class ExpenseResponse(BaseModel):
     id: int
     amount: float
@@ -29,6 +44,44 @@ class ExpenseResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Largest id list accepted by the bulk endpoints
+BULK_MAX_IDS = 10000
+
+class ExpenseChanges(BaseModel):
+    """Fields set by a bulk update; fields left out are not changed"""
+    category: Optional[Category] = None
+    date: Optional[datetime] = None
+    notes: Optional[str] = None
+    receipt_url: Optional[str] = None
+
+    @field_validator("date")
+    @classmethod
+    def naive_utc_date(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return naive_utc(value)
+
+class ExpenseBulkUpdate(BaseModel):
+    # Selection: the listed ids and/or the expenses matching category and date range
+    ids: Optional[List[int]] = Field(None, max_length=BULK_MAX_IDS)
+    category: Optional[Category] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    changes: ExpenseChanges
+
+class BulkUpdateResponse(BaseModel):
+    updated: int
+
+class BulkDeleteResponse(BaseModel):
+    deleted: int
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ExpenseImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
 class PredictionResponse(BaseModel):
     category: Category
     predicted_overspend: float
@@ -37,10 +90,47 @@ class PredictionResponse(BaseModel):
 # Router
 router = APIRouter()
 
+async def get_user_expense(db: AsyncSession, user_id: int, expense_id: int) -> Expense:
+    """Load one of the user's expenses or raise 404"""
+    expense = (await db.execute(
+        select(Expense).where(Expense.id == expense_id, Expense.user_id == user_id)
+    )).scalars().first()
+    
+    if not expense:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Expense not found"
+        )
+    
+    return expense
+
+def bulk_selection(
+    user_id: int,
+    ids: Optional[List[int]],
+    category: Optional[Category],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime]
+) -> list:
+    """WHERE conditions of a bulk request, refusing one that would select every expense"""
+    if ids is None and category is None and start_date is None and end_date is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select expenses by ids, category or date range"
+        )
+    return selection_filter(user_id, ids, category, naive_utc(start_date), naive_utc(end_date))
+
+def raise_prediction_busy():
+    """Reject a prediction while the prediction process pool is saturated"""
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Prediction service is busy, please retry shortly",
+        headers={"Retry-After": "5"}
+    )
+
 @router.post("/", response_model=ExpenseResponse)
-def create_expense(
+async def create_expense(
     expense: ExpenseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if expense.date is None:
@@ -55,103 +145,151 @@ def create_expense(
         receipt_url=expense.receipt_url
     )
     db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    # Derived tables are maintained by sync code, run on the same connection and transaction
+    await db.run_sync(record_expense_change, current_user.id, new=snapshot(db_expense))
+    await db.commit()
+    await db.refresh(db_expense)
     
     return db_expense
 
+@router.post("/import", response_model=ExpenseImportResponse)
+async def import_expenses(
+    request: Request,
+    all_or_nothing: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Import many expenses from a CSV, JSON array or NDJSON request body
+
+    The body is the file itself, with Content-Type text/csv, application/json or
+    application/x-ndjson. CSV needs a header row with amount and category
+    columns; date, notes and receipt_url are optional. Invalid rows are
+    reported by row number and skipped, or with all_or_nothing=true abort the
+    whole import.
+    """
+    try:
+        fmt = expense_import.import_format(request.headers.get("content-type", ""))
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > expense_import.IMPORT_MAX_BYTES:
+            raise expense_import.ExpenseImportTooLarge(
+                f"Imports are limited to {expense_import.IMPORT_MAX_BYTES // (1024 * 1024)}MB"
+            )
+        return await expense_import.import_expenses(
+            db,
+            current_user.id,
+            expense_import.iter_records(request.stream(), fmt),
+            all_or_nothing=all_or_nothing
+        )
+    except expense_import.ExpenseImportError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
 @router.get("/", response_model=List[ExpenseResponse])
-def get_expenses(
+async def get_expenses(
     skip: int = 0,
     limit: int = 100,
     category: Optional[Category] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Expense).filter(Expense.user_id == current_user.id)
+    # Prefer cursor paging; skip is kept for backward compatibility
+    try:
+        expenses = await db.run_sync(
+            expense_crud.get_user_expense_rows,
+            current_user.id,
+            skip=skip,
+            limit=limit,
+            category=category,
+            cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
     
-    if category:
-        query = query.filter(Expense.category == category)
+    # The rows hold exactly the ExpenseResponse fields, so they go straight to orjson
+    # instead of through the response model and the default encoder
+    response = ORJSONResponse(expenses)
+    # A full page means there may be more rows after the last one
+    if expenses and len(expenses) == limit:
+        last = expenses[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last["date"], last["id"])
     
-    expenses = query.order_by(Expense.date.desc()).offset(skip).limit(limit).all()
-    return expenses
+    return response
 
 @router.get("/summary/{year}/{month}")
-def get_expense_summary_by_month(
+async def get_expense_summary_by_month(
     year: int,
     month: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get total expenses by category for specified month
-    month_start = datetime(year, month, 1, 0, 0, 0, 0)
-    if month == 12:
-        month_end = datetime(year + 1, 1, 1, 0, 0, 0, 0)
-    else:
-        month_end = datetime(year, month + 1, 1, 0, 0, 0, 0)
-    
-    summary = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total'),
-        func.count(Expense.id).label('count')
-    ).filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= month_start,
-        Expense.date < month_end
-    ).group_by(Expense.category).all()
-    
-    grand_total = sum([float(total) for _, total, _ in summary])
-    
-    return {
-        "year": year,
-        "month": month,
-        "categories": [
-            {"category": cat, "total": float(total), "count": count, "average": float(total) / count}
-            for cat, total, count in summary
-        ],
-        "grand_total": grand_total
-    }
+    # Get total expenses by category for specified month from the monthly rollup
+    return await db.run_sync(expense_crud.get_monthly_summary, current_user.id, year, month)
 
 @router.get("/summary")
-def get_expense_summary(
-    db: Session = Depends(get_db),
+async def get_expense_summary(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get total expenses by category for the current month
-    current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    
-    summary = db.query(
-        Expense.category,
-        func.sum(Expense.amount).label('total'),
-        func.count(Expense.id).label('count')
-    ).filter(
-        Expense.user_id == current_user.id,
-        Expense.date >= current_month_start
-    ).group_by(Expense.category).all()
+    # Get total expenses by category for the current month from the monthly rollup
+    now = datetime.utcnow()
+    summary = await db.run_sync(expense_crud.get_monthly_summary, current_user.id, now.year, now.month)
     
     return {
-        "month": current_month_start.strftime("%Y-%m"),
+        "month": now.strftime("%Y-%m"),
         "summary": [
-            {"category": cat, "total": float(total), "count": count}
-            for cat, total, count in summary
+            {"category": entry["category"], "total": entry["total"], "count": entry["count"]}
+            for entry in summary["categories"]
         ]
     }
 
+@router.get("/export")
+async def export_expenses(
+    fmt: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    category: Optional[Category] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the user's expenses, oldest first, as CSV, NDJSON or Parquet
+
+    Rows are streamed from a server-side cursor into the response, so memory
+    use does not grow with the size of the history.
+    """
+    try:
+        expense_export.check_format(fmt)
+    except expense_export.ExportUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    query = expense_export.export_query(current_user.id, category, start_date, end_date)
+    return StreamingResponse(
+        expense_export.stream_export(fmt, expense_export.stream_batches(query)),
+        media_type=expense_export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{expense_export.export_filename(fmt)}"'}
+    )
+
 @router.post("/predict/{category}", response_model=PredictionResponse)
-def predict_expense_category(
+async def predict_expense_category(
     category: Category,
+    mode: Optional[ForecastMode] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from ..services.ml_predictor import predict_overspend
+    from services.prediction_store import get_predictions
     
     try:
-        prediction = predict_overspend(db, current_user.id, category.value)
+        prediction = (await get_predictions(db, current_user.id, [category], mode))[category.value]
         return PredictionResponse(
             category=category,
             predicted_overspend=prediction.get("predicted_overspend", 0.0),
             confidence=prediction.get("confidence", 0.0)
         )
+    except (PoolSaturated, asyncio.TimeoutError):
+        raise_prediction_busy()
     except Exception as e:
         # If prediction fails, return default values
         return PredictionResponse(
@@ -161,65 +299,90 @@ def predict_expense_category(
         )
 
 @router.post("/predict", response_model=List[PredictionResponse])
-def predict_expenses(
+async def predict_expenses(
+    mode: Optional[ForecastMode] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    from ..services.ml_predictor import predict_overspend
-    
-    predictions = []
+    from services.prediction_store import get_predictions
     
-    # Get predictions for each category
-    for category in Category:
-        try:
-            prediction = predict_overspend(db, current_user.id, category.value)
-            predictions.append(PredictionResponse(
-                category=category,
-                predicted_overspend=prediction.get("predicted_overspend", 0.0),
-                confidence=prediction.get("confidence", 0.0)
-            ))
-        except Exception as e:
-            # If prediction fails for a category, skip it
-            continue
+    # Precomputed predictions when fresh, otherwise one live pass (FORECAST_MODE unless overridden)
+    try:
+        results = await get_predictions(db, current_user.id, mode=mode)
+    except (PoolSaturated, asyncio.TimeoutError):
+        raise_prediction_busy()
     
-    return predictions
+    return [
+        PredictionResponse(
+            category=category,
+            predicted_overspend=results[category.value].get("predicted_overspend", 0.0),
+            confidence=results[category.value].get("confidence", 0.0)
+        )
+        for category in Category
+    ]
 
-@router.get("/{expense_id}", response_model=ExpenseResponse)
-def get_expense(
-    expense_id: int,
-    db: Session = Depends(get_db),
+@router.patch("/bulk", response_model=BulkUpdateResponse)
+async def bulk_update_expenses(
+    bulk_update: ExpenseBulkUpdate,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.user_id == current_user.id
-    ).first()
-    
-    if not expense:
+    """Change fields of many expenses with a single UPDATE statement"""
+    conditions = bulk_selection(
+        current_user.id, bulk_update.ids, bulk_update.category, bulk_update.start_date, bulk_update.end_date
+    )
+    values = bulk_update.changes.model_dump(exclude_unset=True)
+    if not values:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No changes given"
+        )
+    if "category" in values and values["category"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Category cannot be removed"
+        )
+    if "date" in values and values["date"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Date cannot be removed"
         )
     
-    return expense
+    updated = await db.run_sync(expense_crud.bulk_update, current_user.id, conditions, values)
+    return BulkUpdateResponse(updated=updated)
+
+@router.delete("/bulk", response_model=BulkDeleteResponse)
+async def bulk_delete_expenses(
+    ids: Optional[List[int]] = Query(None, max_length=BULK_MAX_IDS),
+    category: Optional[Category] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete many expenses, selected by repeated ids and/or category and date range, with a single DELETE statement"""
+    conditions = bulk_selection(current_user.id, ids, category, start_date, end_date)
+    deleted = await db.run_sync(expense_crud.bulk_delete, current_user.id, conditions)
+    return BulkDeleteResponse(deleted=deleted)
+
+@router.get("/{expense_id}", response_model=ExpenseResponse)
+async def get_expense(
+    expense_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await get_user_expense(db, current_user.id, expense_id)
 
 @router.put("/{expense_id}", response_model=ExpenseResponse)
-def update_expense(
+async def update_expense(
     expense_id: int,
     expense_update: ExpenseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.user_id == current_user.id
-    ).first()
+    expense = await get_user_expense(db, current_user.id, expense_id)
     
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    old = snapshot(expense)
     
     # Update expense fields
     expense.amount = expense_update.amount
@@ -228,29 +391,22 @@ def update_expense(
     expense.notes = expense_update.notes
     expense.receipt_url = expense_update.receipt_url
     
-    db.commit()
-    db.refresh(expense)
+    await db.run_sync(record_expense_change, current_user.id, old=old, new=snapshot(expense))
+    await db.commit()
+    await db.refresh(expense)
     
     return expense
 
 @router.delete("/{expense_id}")
-def delete_expense(
+async def delete_expense(
     expense_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    expense = db.query(Expense).filter(
-        Expense.id == expense_id,
-        Expense.user_id == current_user.id
-    ).first()
-    
-    if not expense:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Expense not found"
-        )
+    expense = await get_user_expense(db, current_user.id, expense_id)
     
-    db.delete(expense)
-    db.commit()
+    await db.delete(expense)
+    await db.run_sync(record_expense_change, current_user.id, old=snapshot(expense))
+    await db.commit()
     
     return {"message": "Expense deleted successfully"}
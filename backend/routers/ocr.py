@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+import asyncio
 import os
-import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Dict, Any, List, Optional
+from datetime import datetime
 from pydantic import BaseModel
 
-from database import get_db
+from database import get_async_db
 from routers.auth import get_current_user
 from models.base import User
+from services import ocr_jobs
 from services.ocr_service import extract_from_image
+from services.uploads import (
+    MAX_FILE_SIZE, UPLOAD_FILE_OPENAPI, UPLOAD_FILES_OPENAPI, UploadError, UploadedFile,
+    iter_upload_files, read_upload_file
+)
+
+# Largest number of receipts accepted by one /extract-batch request
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "30"))
+# Receipts of one batch processed at the same time (provider calls are further
+# bounded per worker by OCR_MAX_CONCURRENCY)
+OCR_BATCH_CONCURRENCY = int(os.getenv("OCR_BATCH_CONCURRENCY", "8"))
 
 # Pydantic models
 class OCRResponse(BaseModel):
@@ -20,36 +33,27 @@ class OCRResponse(BaseModel):
 # Router
 router = APIRouter()
 
-@router.post("/extract", response_model=OCRResponse)
+@router.post("/extract", response_model=OCRResponse, openapi_extra=UPLOAD_FILE_OPENAPI)
 async def extract_receipt_data(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
+    # Stream the upload into memory, aborting as soon as it exceeds the size limit
+    try:
+        upload = await read_upload_file(request, MAX_FILE_SIZE)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
     # Validate file type
-    if not file.content_type.startswith('image/'):
+    if not upload.content_type.startswith('image/'):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="File must be an image"
         )
     
-    # Validate file size (max 5MB)
-    max_size = 5 * 1024 * 1024  # 5MB
-    file_content = await file.read()
-    if len(file_content) > max_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB"
-        )
-    
-    # Create temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-        temp_file.write(file_content)
-        temp_file_path = temp_file.name
-    
     try:
-        # Extract data using OCR service
-        extracted_data = extract_from_image(temp_file_path)
+        # Extract data using OCR service, passing the bytes straight through
+        extracted_data = await extract_from_image(upload.data, upload.content_type)
         
         return OCRResponse(
             amount=extracted_data.get("amount", 0.0),
@@ -63,8 +67,139 @@ async def extract_receipt_data(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"OCR processing failed: {str(e)}"
         )
-    
+
+class OCRBatchItem(BaseModel):
+    """One line of the /extract-batch NDJSON stream"""
+    index: int
+    filename: str
+    status: str
+    result: Optional[OCRResponse] = None
+    error: Optional[str] = None
+
+async def _extract_batch_item(index: int, upload: UploadedFile, semaphore: asyncio.Semaphore) -> OCRBatchItem:
+    """Extract one receipt of a batch, turning any failure into an error line"""
+    if not upload.content_type.startswith('image/'):
+        return OCRBatchItem(index=index, filename=upload.filename, status="error", error="File must be an image")
+    try:
+        async with semaphore:
+            # Provider failures raise, so they become error lines instead of empty "ok" results
+            extracted_data = await extract_from_image(upload.data, upload.content_type, raise_errors=True)
+        return OCRBatchItem(
+            index=index,
+            filename=upload.filename,
+            status="ok",
+            result=OCRResponse(
+                amount=extracted_data.get("amount", 0.0),
+                category=extracted_data.get("category", "other"),
+                confidence=extracted_data.get("confidence", 0.0),
+                raw_text=extracted_data.get("raw_text", "")
+            )
+        )
+    except Exception as e:
+        return OCRBatchItem(index=index, filename=upload.filename, status="error", error=f"OCR processing failed: {str(e)}")
+
+async def _stream_results(tasks: List["asyncio.Task[OCRBatchItem]"]) -> AsyncIterator[str]:
+    """Yield one NDJSON line per receipt in completion order"""
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            yield item.model_dump_json(exclude_none=True) + "\n"
     finally:
-        # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
+        # The client went away: stop the receipts that are still waiting or running
+        for task in tasks:
+            task.cancel()
+
+@router.post("/extract-batch", openapi_extra=UPLOAD_FILES_OPENAPI)
+async def extract_receipt_batch(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Extract many receipts at once, streaming an NDJSON line per file as soon as it finishes
+
+    Each line is an OCRBatchItem; `index` is the position of the file in the
+    upload, since lines arrive in completion order. A file that fails gets an
+    error line without affecting the others.
+    """
+    semaphore = asyncio.Semaphore(OCR_BATCH_CONCURRENCY)
+    tasks: List["asyncio.Task[OCRBatchItem]"] = []
+    # Each receipt starts as soon as its part has arrived, while later ones are still uploading
+    try:
+        async for upload in iter_upload_files(request, MAX_FILE_SIZE, max_files=OCR_BATCH_MAX_FILES):
+            tasks.append(asyncio.create_task(_extract_batch_item(len(tasks), upload, semaphore)))
+    except BaseException as e:
+        # A rejected upload, a client disconnect or cancellation: stop the receipts already started
+        for task in tasks:
+            task.cancel()
+        if isinstance(e, UploadError):
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        raise
+    if not tasks:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded")
+
+    return StreamingResponse(_stream_results(tasks), media_type="application/x-ndjson")
+
+class OCRJobResponse(BaseModel):
+    id: int
+    status: str
+    filename: Optional[str] = None
+    attempts: int
+    result: Optional[OCRResponse] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+def _job_response(job) -> OCRJobResponse:
+    result = None
+    if job.result is not None:
+        result = OCRResponse(
+            amount=job.result.get("amount", 0.0),
+            category=job.result.get("category", "other"),
+            confidence=job.result.get("confidence", 0.0),
+            raw_text=job.result.get("raw_text", "")
+        )
+    return OCRJobResponse(
+        id=job.id,
+        status=job.status,
+        filename=job.filename,
+        attempts=job.attempts,
+        result=result,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+@router.post("/jobs", response_model=OCRJobResponse, status_code=status.HTTP_202_ACCEPTED, openapi_extra=UPLOAD_FILE_OPENAPI)
+async def create_ocr_job(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a receipt for background OCR; poll GET /ocr/jobs/{id} for the result"""
+    try:
+        upload = await read_upload_file(request, MAX_FILE_SIZE)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    
+    if not upload.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an image"
+        )
+    
+    job = await ocr_jobs.enqueue(db, current_user.id, upload.data, upload.content_type, upload.filename)
+    return _job_response(job)
+
+@router.get("/jobs/{job_id}", response_model=OCRJobResponse)
+async def get_ocr_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    job = await ocr_jobs.get_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="OCR job not found"
+        )
+    return _job_response(job)
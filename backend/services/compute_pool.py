@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# Worker processes for model fitting and scoring (0 runs the work in the threadpool instead,
+# which is the default on serverless platforms where process pools are unavailable)
+ML_POOL_SIZE = int(os.getenv("ML_POOL_SIZE", "0" if os.getenv("VERCEL") else "2"))
+# Tasks queued or running in the pool before new ones are rejected
+ML_POOL_MAX_PENDING = int(os.getenv("ML_POOL_MAX_PENDING", str(max(ML_POOL_SIZE, 1) * 8)))
+# Seconds a request waits for its task
+ML_POOL_TIMEOUT = float(os.getenv("ML_POOL_TIMEOUT", "10"))
+
+class PoolSaturated(Exception):
+    """Raised when ML_POOL_MAX_PENDING tasks are already pending"""
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+_pending = 0
+_completed = 0
+_rejected = 0
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared process pool, creating it on first use (None when disabled)"""
+    global _pool
+    if ML_POOL_SIZE <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # Spawned workers do not inherit the server's sockets, threads or DB connections
+            _pool = ProcessPoolExecutor(max_workers=ML_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def start() -> None:
+    """Start the worker processes ahead of the first request"""
+    pool = get_pool()
+    if pool is not None:
+        for _ in range(ML_POOL_SIZE):
+            pool.submit(int)
+
+def shutdown() -> None:
+    """Stop the worker processes"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def run(fn: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Run a CPU-bound function in the process pool without blocking the event loop
+
+    fn must be a module-level function and args plain picklable values such
+    as NumPy arrays.
+
+    Raises:
+        PoolSaturated: ML_POOL_MAX_PENDING tasks are already pending
+        asyncio.TimeoutError: The task did not finish within the timeout
+    """
+    global _pending, _rejected
+    pool = get_pool()
+    if pool is None:
+        return await run_in_threadpool(fn, *args)
+
+    with _lock:
+        if _pending >= ML_POOL_MAX_PENDING:
+            _rejected += 1
+            raise PoolSaturated(f"{_pending} prediction tasks already pending")
+        _pending += 1
+
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died; replace the pool for the next request
+        _task_done(None)
+        shutdown()
+        raise
+    except BaseException:
+        _task_done(None)
+        raise
+
+    # The slot is freed when the work actually ends, not when the caller stops waiting
+    future.add_done_callback(_task_done)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout or ML_POOL_TIMEOUT)
+
+def _task_done(future: Optional[Future]) -> None:
+    global _pending, _completed
+    with _lock:
+        _pending -= 1
+        if future is not None:
+            _completed += 1
+
+def stats() -> Dict[str, Any]:
+    """Queue depth and counters of the prediction pool"""
+    with _lock:
+        return {
+            "workers": ML_POOL_SIZE,
+            "pending": _pending,
+            "max_pending": ML_POOL_MAX_PENDING,
+            "completed": _completed,
+            "rejected": _rejected
+        }
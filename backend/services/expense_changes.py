@@ -0,0 +1,59 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+from models.base import Expense, Category
+from services import monthly_rollup, regression_state
+
+class ExpenseSnapshot(NamedTuple):
+    """The fields of an expense that derived tables depend on"""
+    category: Category
+    date: datetime
+    amount: float
+
+# (old, new) pair: old is None for inserts, new is None for deletes
+ExpenseChange = Tuple[Optional[ExpenseSnapshot], Optional[ExpenseSnapshot]]
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware datetime to naive UTC, the form expense dates are stored in"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def snapshot(expense: Expense) -> ExpenseSnapshot:
+    """Capture the current state of an expense"""
+    return ExpenseSnapshot(expense.category, expense.date, expense.amount)
+
+def record_expense_change(
+    db: Session,
+    user_id: int,
+    old: Optional[ExpenseSnapshot] = None,
+    new: Optional[ExpenseSnapshot] = None
+) -> None:
+    """Record a single expense insert, update or delete (see record_expense_changes)"""
+    record_expense_changes(db, user_id, [(old, new)])
+
+def record_expense_changes(db: Session, user_id: int, changes: Iterable[ExpenseChange]) -> None:
+    """
+    Apply expense writes to the tables derived from expenses
+
+    Must be called before db.commit() so the derived data is updated in the
+    same transaction as the expenses themselves.
+
+    Args:
+        db: Database session
+        user_id: Owner of the changed expenses
+        changes: (old, new) snapshot pairs
+    """
+    effective: List[ExpenseChange] = []
+    for old, new in changes:
+        # Expenses without a date are not part of any derived series
+        old = old if old is not None and old.date is not None else None
+        new = new if new is not None and new.date is not None else None
+        # Updates that do not touch category, date or amount change nothing derived
+        if old != new:
+            effective.append((old, new))
+    if not effective:
+        return
+
+    regression_state.apply_changes(db, user_id, effective)
+    monthly_rollup.apply_changes(db, user_id, effective)
@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from models.base import Category, Expense
+
+# Rows fetched from the server-side cursor, and written, per batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+EXPORT_COLUMNS = ("id", "date", "category", "amount", "notes", "receipt_url", "created_at")
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional dependency that is not installed"""
+
+def check_format(fmt: ExportFormat) -> None:
+    """Raise ExportUnavailable before streaming starts if fmt cannot be written here"""
+    if fmt == ExportFormat.PARQUET:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("Parquet export needs pyarrow, which is not installed on this server")
+
+def export_query(
+    user_id: int,
+    category: Optional[Category] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    """Select the exported columns of a user's expenses, oldest first"""
+    query = select(*(getattr(Expense, column) for column in EXPORT_COLUMNS)).where(Expense.user_id == user_id)
+    if category:
+        query = query.where(Expense.category == category)
+    if start_date:
+        query = query.where(Expense.date >= start_date)
+    if end_date:
+        query = query.where(Expense.date <= end_date)
+    # Walks the (user_id, date, id) index
+    return query.order_by(Expense.date, Expense.id)
+
+async def stream_batches(query) -> AsyncIterator[Sequence[Any]]:
+    """
+    Run an export query on a server-side cursor, yielding EXPORT_BATCH_SIZE rows at a time
+
+    Opens its own session, since the rows are read while the response is
+    already being sent.
+    """
+    from database import AsyncSessionLocal, get_async_engine
+
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            yield batch
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, Category):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_chunk(batch: Sequence[Any], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_csv_cell(value) for value in row] for row in batch)
+    return buffer.getvalue().encode("utf-8")
+
+def _ndjson_chunk(batch: Sequence[Any]) -> bytes:
+    lines = []
+    for row in batch:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record["category"] = record["category"].value
+        lines.append(json.dumps({key: _json_value(value) for key, value in record.items()}))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+class _ChunkSink:
+    """Write-only file for pyarrow that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers record absolute offsets, so this counts drained bytes too
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.timestamp("us")),
+        ("category", pa.dictionary(pa.int8(), pa.string())),
+        ("amount", pa.float64()),
+        ("notes", pa.string()),
+        ("receipt_url", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+def _parquet_table(batch: Sequence[Any], schema):
+    import pyarrow as pa
+
+    columns = list(zip(*batch))
+    columns[2] = [category.value for category in columns[2]]
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+async def stream_export(fmt: ExportFormat, batches: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    """
+    Encode batches of export rows as CSV, NDJSON or Parquet, one response chunk per batch
+
+    Only one batch is held in memory at a time. Each Parquet batch becomes one
+    row group; the file footer follows the last one.
+    """
+    if fmt == ExportFormat.PARQUET:
+        import pyarrow.parquet as pq
+
+        schema = _parquet_schema()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        try:
+            async for batch in batches:
+                writer.write_table(_parquet_table(batch, schema))
+                yield sink.drain()
+        finally:
+            # An empty export is still a valid file with the schema
+            writer.close()
+        yield sink.drain()
+        return
+
+    first = True
+    async for batch in batches:
+        if fmt == ExportFormat.CSV:
+            yield _csv_chunk(batch, header=first)
+        else:
+            yield _ndjson_chunk(batch)
+        first = False
+    if first and fmt == ExportFormat.CSV:
+        yield _csv_chunk([], header=True)
+
+def export_filename(fmt: ExportFormat, now: Optional[datetime] = None) -> str:
+    """Download name of an export, e.g. expenses-20261016.csv"""
+    return f"expenses-{(now or datetime.utcnow()).strftime('%Y%m%d')}.{fmt.value}"
@@ -0,0 +1,302 @@
+import codecs
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.base import Category, Expense
+from services.expense_changes import ExpenseSnapshot, naive_utc, record_expense_changes
+
+# Rows validated and inserted per statement
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Largest accepted import, in rows and in bytes of the request body
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "100000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# Row errors listed in the response (all are counted)
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+JSON_TYPES = ("application/json",)
+
+class ExpenseImportError(ValueError):
+    """Unreadable import, mapped to 400 by the routers"""
+    status_code = 400
+
+class ExpenseImportTooLarge(ExpenseImportError):
+    """Import over the row or size limit, mapped to 413 by the routers"""
+    status_code = 413
+
+# The date field would shadow datetime.date in its own annotation
+CalendarDate = date
+
+class ExpenseImportRow(BaseModel):
+    """One imported expense; unknown columns are ignored"""
+    amount: float = Field(allow_inf_nan=False)
+    category: Category
+    # Bank exports usually have date-only cells, imported as midnight
+    date: Optional[Union[datetime, CalendarDate]] = None
+    notes: Optional[str] = None
+    receipt_url: Optional[str] = None
+
+    @field_validator("date", "notes", "receipt_url", mode="before")
+    @classmethod
+    def blank_as_missing(cls, value: Any) -> Any:
+        # Empty CSV cells mean "not given"
+        return None if value == "" else value
+
+    @field_validator("date")
+    @classmethod
+    def naive_utc_datetime(cls, value: Optional[Union[datetime, CalendarDate]]) -> Optional[datetime]:
+        if value is not None and not isinstance(value, datetime):
+            return datetime.combine(value, time())
+        return naive_utc(value)
+
+    @field_validator("category", mode="before")
+    @classmethod
+    def normalize_category(cls, value: Any) -> Any:
+        return value.strip().lower() if isinstance(value, str) else value
+
+_rows_adapter = TypeAdapter(List[ExpenseImportRow])
+
+class RowError(NamedTuple):
+    """
+    Why a row was rejected
+
+    Row numbers are line numbers after the CSV header (a record spanning
+    lines inside quotes has the number of its first line), NDJSON line
+    numbers, or positions in a JSON array, all starting at 1.
+    """
+    row: int
+    errors: List[str]
+
+# (row number, record) as yielded by iter_records
+NumberedRecord = Tuple[int, Any]
+
+def import_format(content_type: str) -> str:
+    """Map a request Content-Type to csv, ndjson or json"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return "csv"
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    if media_type in JSON_TYPES:
+        return "json"
+    raise ExpenseImportError("Send the import as text/csv, application/json (an array) or application/x-ndjson")
+
+async def _limited(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > IMPORT_MAX_BYTES:
+            raise ExpenseImportTooLarge(f"Imports are limited to {IMPORT_MAX_BYTES // (1024 * 1024)}MB")
+        yield chunk
+
+def _record_boundary(text: str) -> int:
+    """Length of the longest prefix of text ending with a newline outside CSV quotes"""
+    cut = start = quotes = 0
+    while True:
+        newline = text.find("\n", start)
+        if newline < 0:
+            return cut
+        quotes += text.count('"', start, newline)
+        if quotes % 2 == 0:
+            cut = newline + 1
+        start = newline + 1
+
+async def _iter_text_batches(chunks: AsyncIterator[bytes], quoted: bool) -> AsyncIterator[str]:
+    """Decode a UTF-8 body into runs of complete lines (records may span lines inside CSV quotes)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        try:
+            pending += decoder.decode(chunk)
+        except UnicodeDecodeError:
+            raise ExpenseImportError("Imports must be UTF-8 encoded")
+        cut = _record_boundary(pending) if quoted else pending.rfind("\n") + 1
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[List[NumberedRecord]]:
+    """
+    Parse a streamed import body into batches of numbered records (dicts, or whatever the JSON holds)
+
+    CSV and NDJSON are parsed as the body arrives. A JSON array has to be
+    complete before it can be parsed, so it is read whole (within
+    IMPORT_MAX_BYTES). Blank lines are skipped but still counted in the
+    row numbers.
+
+    Raises:
+        ExpenseImportError: The body is not valid CSV or JSON, or misses columns
+        ExpenseImportTooLarge: The body is over IMPORT_MAX_BYTES
+    """
+    chunks = _limited(chunks)
+    if fmt == "json":
+        body = b"".join([chunk async for chunk in chunks])
+        try:
+            records = json.loads(body)
+        except ValueError as e:
+            raise ExpenseImportError(f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise ExpenseImportError("A JSON import must be an array of expenses")
+        yield list(enumerate(records, 1))
+    elif fmt == "ndjson":
+        line = 0
+        async for text in _iter_text_batches(chunks, quoted=False):
+            batch = []
+            for text_line in text.splitlines():
+                line += 1
+                if text_line.strip():
+                    try:
+                        batch.append((line, json.loads(text_line)))
+                    except ValueError as e:
+                        raise ExpenseImportError(f"Invalid NDJSON line {line}: {e}")
+            yield batch
+    else:
+        header: Optional[List[str]] = None
+        # Physical lines read so far, and how many of them the header took
+        lines = header_lines = 0
+        async for text in _iter_text_batches(chunks, quoted=True):
+            batch = []
+            reader = csv.reader(io.StringIO(text))
+            consumed = lines
+            try:
+                for row in reader:
+                    first_line = lines + 1
+                    lines = consumed + reader.line_num
+                    if header is None:
+                        header = [name.strip().lower() for name in row]
+                        header_lines = lines
+                        missing = {"amount", "category"} - set(header)
+                        if missing:
+                            raise ExpenseImportError(f"CSV header is missing {', '.join(sorted(missing))}")
+                    # Blank lines are skipped; short rows leave their last columns missing
+                    elif any(cell.strip() for cell in row):
+                        batch.append((first_line - header_lines, dict(zip(header, row))))
+            except csv.Error as e:
+                raise ExpenseImportError(f"Invalid CSV: {e}")
+            yield batch
+
+def validate_rows(numbered: List[NumberedRecord]) -> Tuple[List[ExpenseImportRow], List[RowError]]:
+    """
+    Validate a batch of numbered records in one TypeAdapter call
+
+    Returns:
+        Tuple of (valid rows in order, errors of the rejected rows)
+    """
+    records = [record for _, record in numbered]
+    try:
+        return _rows_adapter.validate_python(records), []
+    except ValidationError as e:
+        messages: Dict[int, List[str]] = {}
+        reported = set()
+        for error in e.errors():
+            index, *field = error["loc"]
+            # Rows are flat; further parts name union members (date.datetime, date.date),
+            # whose errors are the same mistake, so only the first is reported
+            location = str(field[0]) if field else ""
+            if (index, location) in reported:
+                continue
+            reported.add((index, location))
+            messages.setdefault(index, []).append(f"{location}: {error['msg']}" if location else error["msg"])
+    # Only the rows that failed are left out; the others validate on the second pass
+    valid = _rows_adapter.validate_python([record for i, record in enumerate(records) if i not in messages])
+    errors = [RowError(numbered[index][0], messages[index]) for index in sorted(messages)]
+    return valid, errors
+
+def _insert_rows(db: Session, user_id: int, rows: List[ExpenseImportRow], now: datetime) -> None:
+    """Insert rows in one executemany and update the derived tables (sync, run via run_sync)"""
+    values = [
+        {
+            "user_id": user_id,
+            "amount": row.amount,
+            "category": row.category,
+            "date": row.date or now,
+            "notes": row.notes,
+            "receipt_url": row.receipt_url,
+            "created_at": now
+        }
+        for row in rows
+    ]
+    # A Core executemany reuses one cached compiled statement; the drivers batch it into
+    # multi-row INSERTs (psycopg2, SQLite) or a pipelined prepared statement (asyncpg)
+    db.execute(insert(Expense.__table__), values)
+    record_expense_changes(db, user_id, [
+        (None, ExpenseSnapshot(value["category"], value["date"], value["amount"])) for value in values
+    ])
+
+async def import_expenses(
+    db: AsyncSession,
+    user_id: int,
+    batches: AsyncIterator[List[NumberedRecord]],
+    all_or_nothing: bool = False
+) -> Dict[str, Any]:
+    """
+    Validate and insert imported expenses in chunks, in a single transaction
+
+    Args:
+        db: Async database session
+        user_id: Owner of the imported expenses
+        batches: Records from iter_records
+        all_or_nothing: Import nothing if any row is invalid (otherwise valid rows are kept)
+
+    Returns:
+        Dictionary with imported and failed row counts and the row errors
+
+    Raises:
+        ExpenseImportTooLarge: The import has more than IMPORT_MAX_ROWS rows
+    """
+    now = datetime.utcnow()
+    seen = imported = failed = 0
+    errors: List[RowError] = []
+
+    async def write_chunk(records: List[NumberedRecord]) -> None:
+        nonlocal seen, imported, failed
+        rows, row_errors = validate_rows(records)
+        seen += len(records)
+        failed += len(row_errors)
+        errors.extend(row_errors[:IMPORT_MAX_REPORTED_ERRORS - len(errors)])
+        # After the first error an all-or-nothing import only validates the rest, to report it
+        if rows and not (all_or_nothing and failed):
+            await db.run_sync(_insert_rows, user_id, rows, now)
+            imported += len(rows)
+
+    pending: List[NumberedRecord] = []
+    try:
+        async for records in batches:
+            if seen + len(pending) + len(records) > IMPORT_MAX_ROWS:
+                raise ExpenseImportTooLarge(f"Imports are limited to {IMPORT_MAX_ROWS} rows")
+            pending.extend(records)
+            offset = 0
+            while len(pending) - offset >= IMPORT_CHUNK_SIZE:
+                await write_chunk(pending[offset:offset + IMPORT_CHUNK_SIZE])
+                offset += IMPORT_CHUNK_SIZE
+            del pending[:offset]
+        if pending:
+            await write_chunk(pending)
+    except BaseException:
+        await db.rollback()
+        raise
+
+    if all_or_nothing and failed:
+        await db.rollback()
+        imported = 0
+    else:
+        await db.commit()
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": [{"row": error.row, "errors": error.errors} for error in errors]
+    }
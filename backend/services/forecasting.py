@@ -0,0 +1,286 @@
+import asyncio
+import enum
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models.base import Category, ExpenseMonthlyRollup
+from services import compute_pool
+from services.ml_predictor import CATEGORIES, CATEGORY_INDEX, PredictionPlan, fit_linear_regressions
+from services.regression_state import prepare_state_prediction
+
+class ForecastMode(str, enum.Enum):
+    """How overspend predictions are produced"""
+    TRANSACTION = "transaction"  # per-expense regression (incremental state)
+    MONTHLY = "monthly"          # linear trend on monthly totals
+    SEASONAL = "seasonal"        # linear trend plus an annual seasonal term on monthly totals
+    ETS = "ets"                  # Holt's linear exponential smoothing on monthly totals
+
+FORECAST_MODE = ForecastMode(os.getenv("FORECAST_MODE", ForecastMode.TRANSACTION.value))
+
+# Smoothing factors of the level and trend for ForecastMode.ETS
+ETS_ALPHA = float(os.getenv("FORECAST_ETS_ALPHA", "0.5"))
+ETS_BETA = float(os.getenv("FORECAST_ETS_BETA", "0.3"))
+
+# Months averaged into the baseline that the forecast is compared with
+RECENT_MONTHS = 3
+
+def predict_for_user(
+    db: Session,
+    user_id: int,
+    categories: Optional[List[Category]] = None,
+    mode: Optional[ForecastMode] = None,
+    commit: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Predict overspend for a user's categories with the configured forecast mode
+
+    Args:
+        db: Database session
+        user_id: User ID to predict for
+        categories: Categories to predict (all by default)
+        mode: Forecast mode (FORECAST_MODE by default)
+        commit: Commit models stored while predicting; False leaves them in the caller's transaction
+
+    Returns:
+        Dictionary mapping each category value to a prediction result
+    """
+    categories = categories or CATEGORIES
+    try:
+        return prepare_prediction(db, user_id, categories, mode, commit).run(db)
+    except Exception as e:
+        return _failed(categories, e)
+
+async def predict_for_user_async(
+    db: Session,
+    user_id: int,
+    categories: Optional[List[Category]] = None,
+    mode: Optional[ForecastMode] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Same as predict_for_user, for async routes
+
+    Database phases run in the threadpool and the CPU-bound phase runs in
+    the prediction process pool, so neither blocks the event loop.
+
+    Raises:
+        PoolSaturated: Too many predictions are already queued
+        asyncio.TimeoutError: The computation exceeded ML_POOL_TIMEOUT
+    """
+    categories = categories or CATEGORIES
+    try:
+        plan = await run_in_threadpool(prepare_prediction, db, user_id, categories, mode)
+        if plan.compute is None:
+            return plan.results
+        output = await compute_pool.run(plan.compute, *plan.args)
+        return await run_in_threadpool(plan.finish, db, output)
+    except (compute_pool.PoolSaturated, asyncio.TimeoutError):
+        raise
+    except Exception as e:
+        return _failed(categories, e)
+
+def prepare_prediction(
+    db: Session,
+    user_id: int,
+    categories: List[Category],
+    mode: Optional[ForecastMode] = None,
+    commit: bool = True
+) -> PredictionPlan:
+    """Load the inputs of a prediction in the given mode (FORECAST_MODE by default)"""
+    mode = mode or FORECAST_MODE
+    if mode == ForecastMode.TRANSACTION:
+        return prepare_state_prediction(db, user_id, categories, commit)
+    return prepare_monthly_forecast(db, user_id, mode, categories)
+
+def forecast_monthly_totals(
+    db: Session,
+    user_id: int,
+    mode: ForecastMode,
+    categories: Optional[List[Category]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Forecast next month's spending per category (see prepare_monthly_forecast)"""
+    categories = categories or CATEGORIES
+    try:
+        return prepare_monthly_forecast(db, user_id, mode, categories).run(db)
+    except Exception as e:
+        return _failed(categories, e)
+
+def prepare_monthly_forecast(
+    db: Session,
+    user_id: int,
+    mode: ForecastMode,
+    categories: List[Category]
+) -> PredictionPlan:
+    """
+    Load monthly spending totals per category for a forecast
+
+    Totals are read from the maintained monthly rollup, one row per
+    (category, month), so the model is fitted on O(months) points and the
+    cost does not depend on the number of expenses.
+    predicted_overspend then compares next month's forecast total with the
+    average of the latest complete monthly totals.
+
+    Args:
+        db: Database session
+        user_id: User ID to predict for
+        mode: One of the monthly forecast modes
+        categories: Categories to predict
+
+    Returns:
+        Plan whose compute step is forecast_monthly_series
+    """
+    rows = db.query(
+        ExpenseMonthlyRollup.category,
+        ExpenseMonthlyRollup.year,
+        ExpenseMonthlyRollup.month,
+        ExpenseMonthlyRollup.total
+    ).filter(
+        ExpenseMonthlyRollup.user_id == user_id,
+        ExpenseMonthlyRollup.category.in_(categories)
+    ).all()
+
+    groups = np.array([CATEGORY_INDEX[category] for category, _, _, _ in rows], dtype=np.int64)
+    months = np.array([year * 12 + month - 1 for _, year, month, _ in rows], dtype=np.int64)
+    totals = np.array([float(total) for _, _, _, total in rows], dtype=np.float64)
+    now = datetime.utcnow()
+    current_month = now.year * 12 + now.month - 1
+
+    def finish(db: Session, output: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return {category.value: output[CATEGORY_INDEX[category]] for category in categories}
+
+    return PredictionPlan({}, forecast_monthly_series, (groups, months, totals, len(CATEGORIES), mode, current_month), finish)
+
+def forecast_monthly_series(
+    groups: np.ndarray,
+    months: np.ndarray,
+    totals: np.ndarray,
+    n_groups: int,
+    mode: ForecastMode,
+    current_month: int
+) -> List[Dict[str, Any]]:
+    """
+    Forecast next month's spending of several monthly series
+
+    Each series runs from its first month with spending up to the last
+    complete month, with zeros for months without spending. The current,
+    partial month (and any later one) is left out, and the forecast is two
+    steps past the series: the calendar month after the current one.
+
+    Args:
+        groups: Group index of each (group, month) total
+        months: Month ordinal (year * 12 + month - 1) of each total
+        totals: Amount spent in that month
+        n_groups: Number of groups (results are returned for all of them)
+        mode: One of the monthly forecast modes
+        current_month: Month ordinal of the current month
+
+    Returns:
+        List of result dictionaries, one per group
+    """
+    results = []
+    series = []
+    for group in range(n_groups):
+        mask = (groups == group) & (months < current_month)
+        if not mask.any():
+            results.append(_insufficient(0))
+            continue
+
+        # Months without expenses, up to the last complete one, count as zero spending
+        first_month = months[mask].min()
+        y = np.zeros(current_month - first_month)
+        np.add.at(y, months[mask] - first_month, totals[mask])
+
+        results.append(_insufficient(len(y)))
+        if len(y) >= 3:
+            series.append((group, first_month, y))
+
+    if not series:
+        return results
+
+    # Every series ends with the month before current_month
+    steps = 2
+    if mode == ForecastMode.ETS:
+        forecasts = [holt_forecast(y, ETS_ALPHA, ETS_BETA, steps) for _, _, y in series]
+    else:
+        forecasts = _regression_forecasts(series, seasonal=mode == ForecastMode.SEASONAL, steps=steps)
+
+    for (group, _, y), (forecast, confidence) in zip(series, forecasts):
+        recent_avg = float(y[-RECENT_MONTHS:].mean())
+        prediction = max(0.0, forecast)
+        results[group] = {
+            "predicted_overspend": round(max(0.0, prediction - recent_avg), 2),
+            "confidence": round(max(0.0, min(1.0, confidence)), 3),
+            "data_points": len(y),
+            "prediction": round(prediction, 2),
+            "recent_average": round(recent_avg, 2)
+        }
+
+    return results
+
+def _regression_forecasts(series: list, seasonal: bool, steps: int = 1) -> List[tuple]:
+    """Fit a trend (and annual seasonal) regression to every series at once and forecast steps past its end"""
+    def features(month_ordinals: np.ndarray, first_month: int) -> np.ndarray:
+        columns = [month_ordinals - first_month]
+        if seasonal:
+            angle = 2 * np.pi * (month_ordinals % 12) / 12
+            columns += [np.sin(angle), np.cos(angle)]
+        return np.column_stack(columns).astype(np.float64)
+
+    groups = np.concatenate([np.full(len(y), i) for i, (_, _, y) in enumerate(series)])
+    X = np.vstack([features(first_month + np.arange(len(y)), first_month) for _, first_month, y in series])
+    y = np.concatenate([y for _, _, y in series])
+
+    coef, intercept, r2 = fit_linear_regressions(groups, X, y, len(series))
+
+    forecasts = []
+    for i, (_, first_month, values) in enumerate(series):
+        x_next = features(np.array([first_month + len(values) - 1 + steps]), first_month)[0]
+        forecasts.append((float(x_next @ coef[i] + intercept[i]), float(r2[i])))
+    return forecasts
+
+def holt_forecast(y: np.ndarray, alpha: float, beta: float, steps: int = 1) -> tuple:
+    """
+    Forecast steps ahead with Holt's linear exponential smoothing
+
+    Returns:
+        Tuple of (forecast, confidence) where confidence is the R² of the
+        in-sample one-step-ahead forecasts
+    """
+    level = y[0]
+    trend = y[1] - y[0]
+    squared_errors = 0.0
+    for value in y[1:]:
+        squared_errors += (value - (level + trend)) ** 2
+        previous_level = level
+        level = alpha * value + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+
+    total = float(((y[1:] - y[1:].mean()) ** 2).sum())
+    if total > 0:
+        confidence = 1 - squared_errors / total
+    else:
+        confidence = 1.0 if squared_errors == 0 else 0.0
+    return float(level + steps * trend), float(confidence)
+
+def _insufficient(data_points: int) -> Dict[str, Any]:
+    return {
+        "predicted_overspend": 0.0,
+        "confidence": 0.0,
+        "data_points": data_points,
+        "message": "Insufficient historical data"
+    }
+
+def _failed(categories: List[Category], error: Exception) -> Dict[str, Dict[str, Any]]:
+    return {
+        category.value: {
+            "predicted_overspend": 0.0,
+            "confidence": 0.0,
+            "data_points": 0,
+            "error": str(error)
+        }
+        for category in categories
+    }
@@ -0,0 +1,73 @@
+import io
+import logging
+import os
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Receipt photos are normalized before they are sent to an OCR provider: a phone photo
+# is usually several MB, while text stays legible at a fraction of the resolution
+OCR_IMAGE_NORMALIZE = os.getenv("OCR_IMAGE_NORMALIZE", "true").lower() == "true"
+# Longest side in pixels after downscaling
+OCR_IMAGE_MAX_DIMENSION = int(os.getenv("OCR_IMAGE_MAX_DIMENSION", "1600"))
+OCR_IMAGE_JPEG_QUALITY = int(os.getenv("OCR_IMAGE_JPEG_QUALITY", "80"))
+OCR_IMAGE_GRAYSCALE = os.getenv("OCR_IMAGE_GRAYSCALE", "true").lower() == "true"
+
+class NormalizedImage(NamedTuple):
+    """Image bytes to send to a provider"""
+    data: bytes
+    content_type: str
+
+def settings_tag() -> str:
+    """Short description of the normalization settings, part of the OCR cache key"""
+    if not OCR_IMAGE_NORMALIZE:
+        return "raw"
+    return f"{OCR_IMAGE_MAX_DIMENSION}px-q{OCR_IMAGE_JPEG_QUALITY}{'-gray' if OCR_IMAGE_GRAYSCALE else ''}"
+
+def normalize_image(image: bytes, content_type: str = "image/jpeg") -> NormalizedImage:
+    """
+    Downscale and re-encode a receipt image as a small JPEG (CPU-bound, run in the threadpool)
+
+    The image is rotated upright from its EXIF orientation, shrunk so its longest
+    side is at most OCR_IMAGE_MAX_DIMENSION, optionally converted to grayscale,
+    and saved without any metadata. Images Pillow cannot decode are returned
+    unchanged, and so is the original when re-encoding would not make it smaller.
+
+    Args:
+        image: Receipt image bytes, straight from the upload
+        content_type: MIME type of the image
+
+    Returns:
+        The bytes and MIME type to send
+    """
+    original = NormalizedImage(image, content_type)
+    if not OCR_IMAGE_NORMALIZE:
+        return original
+
+    # Imported here to keep Pillow out of the API's cold start
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(image)) as img:
+            orientation = img.getexif().get(0x0112, 1)
+            # Let the JPEG decoder skip straight to a reduced scale (and to grayscale)
+            # instead of decoding every pixel of a 12MP photo; rotation by 90 degrees
+            # swaps the sides, which the square bound does not care about
+            img.draft("L" if OCR_IMAGE_GRAYSCALE else "RGB", (OCR_IMAGE_MAX_DIMENSION, OCR_IMAGE_MAX_DIMENSION))
+            normalized = ImageOps.exif_transpose(img)
+            normalized = normalized.convert("L" if OCR_IMAGE_GRAYSCALE else "RGB")
+            normalized.thumbnail((OCR_IMAGE_MAX_DIMENSION, OCR_IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            # A fresh save writes no EXIF, ICC profile or comments
+            normalized.save(buffer, format="JPEG", quality=OCR_IMAGE_JPEG_QUALITY, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Could not normalize %s receipt image, sending it unchanged: %s", content_type, e)
+        return original
+
+    data = buffer.getvalue()
+    # An already small upright image can grow when re-encoded; a rotated one is
+    # always sent normalized, since providers read sideways text poorly
+    if len(data) >= len(image) and orientation == 1:
+        return original
+    return NormalizedImage(data, "image/jpeg")
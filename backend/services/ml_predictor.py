@@ -1,10 +1,18 @@
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
 import numpy as np
 from sqlalchemy.orm import Session
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from models.base import Expense
+from typing import TYPE_CHECKING, Dict, Any, List, Callable, Optional
+from models.base import Expense, Category
+
+# sklearn is only needed by the reference implementation (predict_overspend) and is
+# imported there, keeping it out of the API's import time
+if TYPE_CHECKING:
+    from sklearn.linear_model import LinearRegression
+
+# Category order used for batched predictions
+CATEGORIES = list(Category)
+CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
 
 def predict_overspend(db: Session, user_id: int, category: str) -> Dict[str, Any]:
     """
@@ -25,8 +33,8 @@ def predict_overspend(db: Session, user_id: int, category: str) -> Dict[str, Any
         # Get historical expenses for this category
         expenses = db.query(Expense).filter(
             Expense.user_id == user_id,
-            Expense.category == category
-        ).order_by(Expense.date.asc()).all()
+            Expense.category == Category(category)
+        ).order_by(Expense.date.asc(), Expense.id.asc()).all()
         
         # Need at least 3 data points for meaningful prediction
         if len(expenses) < 3:
@@ -41,6 +49,7 @@ def predict_overspend(db: Session, user_id: int, category: str) -> Dict[str, Any
         X, y = prepare_training_data(expenses)
         
         # Train Linear Regression model
+        from sklearn.linear_model import LinearRegression
         model = LinearRegression()
         model.fit(X, y)
         
@@ -94,7 +103,7 @@ def prepare_training_data(expenses: List[Expense]) -> tuple:
     
     return np.array(X), np.array(y)
 
-def predict_next_month(model: LinearRegression, expenses: List[Expense]) -> float:
+def predict_next_month(model: "LinearRegression", expenses: List[Expense]) -> float:
     """
     Predict expense for next month
     
@@ -128,7 +137,7 @@ def calculate_recent_average(expenses: List[Expense]) -> float:
     recent_expenses = expenses[-3:] if len(expenses) >= 3 else expenses
     return np.mean([e.amount for e in recent_expenses])
 
-def calculate_model_confidence(model: LinearRegression, X: np.ndarray, y: np.ndarray) -> float:
+def calculate_model_confidence(model: "LinearRegression", X: np.ndarray, y: np.ndarray) -> float:
     """
     Calculate model confidence using R² score
     
@@ -145,6 +154,7 @@ def calculate_model_confidence(model: LinearRegression, X: np.ndarray, y: np.nda
         y_pred = model.predict(X)
         
         # Calculate R² score
+        from sklearn.metrics import r2_score
         r2 = r2_score(y, y_pred)
         
         # Normalize to 0-1 range (R² can be negative)
@@ -155,6 +165,243 @@ def calculate_model_confidence(model: LinearRegression, X: np.ndarray, y: np.nda
     except Exception:
         return 0.0
 
+@dataclass
+class FittedModel:
+    """Fitted overspend regression of one expense series, with its scoring inputs"""
+    coef: List[float]
+    intercept: float
+    r2: float
+    first_date: datetime
+    last_date: datetime
+    recent_average: float
+    data_points: int
+    
+    def predict(self) -> Dict[str, Any]:
+        """Overspend result for the month after the last expense (see predict_overspend)"""
+        next_month_date = self.last_date + timedelta(days=30)
+        x_pred = np.array(feature_vector(next_month_date, self.recent_average, self.first_date), dtype=np.float64)
+        prediction = max(0.0, float(x_pred @ np.asarray(self.coef) + self.intercept))
+        overspend = max(0.0, prediction - self.recent_average)
+        
+        return {
+            "predicted_overspend": round(overspend, 2),
+            "confidence": round(max(0.0, min(1.0, self.r2)), 3),
+            "data_points": self.data_points,
+            "prediction": round(prediction, 2),
+            "recent_average": round(self.recent_average, 2)
+        }
+
+@dataclass
+class PredictionPlan:
+    """
+    A prediction split into its database and CPU phases
+    
+    results holds what is known without computing (stored models, series
+    with too little data). compute is a module-level function that only
+    takes and returns plain NumPy values, so it can run in another process;
+    finish(db, output) turns its output into the final results.
+    """
+    results: Dict[str, Dict[str, Any]]
+    compute: Optional[Callable] = None
+    args: tuple = field(default_factory=tuple)
+    finish: Optional[Callable] = None
+    
+    def run(self, db: Session) -> Dict[str, Dict[str, Any]]:
+        """Run all phases in the calling thread"""
+        if self.compute is None:
+            return self.results
+        return self.finish(db, self.compute(*self.args))
+
+def feature_vector(date: datetime, amount: float, first_date: datetime) -> tuple:
+    """Regression features of one expense (see prepare_training_data)"""
+    return (date.month, (date - first_date).days, amount)
+
+def predict_overspend_all(db: Session, user_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Predict overspend for every category with one query and one batched solve
+    
+    Produces the same per-category results as calling predict_overspend for
+    each category, but fetches only (category, date, amount) in a single
+    round trip and fits all category regressions together with NumPy.
+    
+    Args:
+        db: Database session
+        user_id: User ID to get expenses for
+        
+    Returns:
+        Dictionary mapping each category value to a predict_overspend result
+    """
+    try:
+        rows = db.query(Expense.category, Expense.date, Expense.amount).filter(
+            Expense.user_id == user_id,
+            Expense.date.isnot(None)
+        ).order_by(Expense.category, Expense.date.asc(), Expense.id.asc()).all()
+        
+        groups = np.array([CATEGORY_INDEX[category] for category, _, _ in rows], dtype=np.int64)
+        dates = np.array([date for _, date, _ in rows], dtype="datetime64[us]")
+        amounts = np.array([amount for _, _, amount in rows], dtype=np.float64)
+        
+        # Rows must be contiguous per category and in date order within each one
+        order = np.lexsort((dates, groups))
+        results = predict_overspend_batch(groups[order], dates[order], amounts[order], len(CATEGORIES))
+        
+        return {category.value: result for category, result in zip(CATEGORIES, results)}
+        
+    except Exception as e:
+        return {
+            category.value: {
+                "predicted_overspend": 0.0,
+                "confidence": 0.0,
+                "data_points": 0,
+                "error": str(e)
+            }
+            for category in CATEGORIES
+        }
+
+def predict_overspend_batch(
+    groups: np.ndarray,
+    dates: np.ndarray,
+    amounts: np.ndarray,
+    n_groups: int
+) -> List[Dict[str, Any]]:
+    """
+    Vectorized equivalent of predict_overspend over several expense series
+    
+    Args:
+        groups: Group index of each expense, sorted so that groups are contiguous
+        dates: Expense dates as datetime64, ascending within each group
+        amounts: Expense amounts
+        n_groups: Number of groups (results are returned for all of them)
+        
+    Returns:
+        List of result dictionaries, one per group
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.searchsorted(groups, np.arange(n_groups), side="left")
+    ends = starts + counts
+    fitted = np.flatnonzero(counts >= 3)
+    
+    results = [
+        {
+            "predicted_overspend": 0.0,
+            "confidence": 0.0,
+            "data_points": int(count),
+            "message": "Insufficient historical data"
+        }
+        for count in counts
+    ]
+    if len(fitted) == 0:
+        return results
+    
+    # Features: month index, days since first expense, amount (see prepare_training_data)
+    first_dates = dates[starts[groups]]
+    X = np.column_stack([
+        month_index(dates),
+        (dates - first_dates) // np.timedelta64(1, "D"),
+        amounts
+    ]).astype(np.float64)
+    
+    coef, intercept, r2 = fit_linear_regressions(groups, X, amounts, n_groups)
+    
+    # Prediction point for next month (see predict_next_month)
+    last = ends[fitted] - 1
+    next_month_dates = dates[last] + np.timedelta64(30, "D")
+    recent_avg = (amounts[last] + amounts[last - 1] + amounts[last - 2]) / 3
+    X_pred = np.column_stack([
+        month_index(next_month_dates),
+        (next_month_dates - dates[starts[fitted]]) // np.timedelta64(1, "D"),
+        recent_avg
+    ]).astype(np.float64)
+    predictions = np.maximum(0, np.einsum("gi,gi->g", X_pred, coef[fitted]) + intercept[fitted])
+    overspend = np.maximum(0, predictions - recent_avg)
+    confidence = np.clip(r2[fitted], 0, 1)
+    
+    for i, group in enumerate(fitted):
+        results[group] = {
+            "predicted_overspend": round(float(overspend[i]), 2),
+            "confidence": round(float(confidence[i]), 3),
+            "data_points": int(counts[group]),
+            "prediction": round(float(predictions[i]), 2),
+            "recent_average": round(float(recent_avg[i]), 2)
+        }
+    
+    return results
+
+def month_index(dates: np.ndarray) -> np.ndarray:
+    """Calendar month (1-12) of each datetime64 value"""
+    return dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+
+def fit_linear_regressions(
+    groups: np.ndarray,
+    X: np.ndarray,
+    y: np.ndarray,
+    n_groups: int
+) -> tuple:
+    """
+    Fit one ordinary least squares model with intercept per group
+    
+    Args:
+        groups: Group index of each row
+        X: Feature matrix of shape (rows, features)
+        y: Target values
+        n_groups: Number of groups
+        
+    Returns:
+        Tuple of (coef, intercept, r2) with one entry per group
+    """
+    n_features = X.shape[1]
+    counts = np.bincount(groups, minlength=n_groups).astype(np.float64)
+    safe_counts = np.maximum(counts, 1)
+    
+    x_mean = np.zeros((n_groups, n_features))
+    np.add.at(x_mean, groups, X)
+    x_mean /= safe_counts[:, None]
+    y_mean = np.bincount(groups, weights=y, minlength=n_groups) / safe_counts
+    
+    # Center per group before accumulating, like LinearRegression does
+    Xc = X - x_mean[groups]
+    yc = y - y_mean[groups]
+    xtx = np.zeros((n_groups, n_features, n_features))
+    np.add.at(xtx, groups, Xc[:, :, None] * Xc[:, None, :])
+    xty = np.zeros((n_groups, n_features))
+    np.add.at(xty, groups, Xc * yc[:, None])
+    yty = np.bincount(groups, weights=yc * yc, minlength=n_groups)
+    
+    return solve_least_squares(x_mean, y_mean, xtx, xty, yty)
+
+def solve_least_squares(
+    x_mean: np.ndarray,
+    y_mean: np.ndarray,
+    xtx: np.ndarray,
+    xty: np.ndarray,
+    yty: np.ndarray
+) -> tuple:
+    """
+    Solve stacked least squares problems from centered cross-products
+    
+    Uses the pseudo-inverse so rank-deficient groups get the same minimum-norm
+    solution as LinearRegression.
+    
+    Args:
+        x_mean: Feature means, shape (groups, features)
+        y_mean: Target means, shape (groups,)
+        xtx: Centered XᵀX, shape (groups, features, features)
+        xty: Centered Xᵀy, shape (groups, features)
+        yty: Centered yᵀy, shape (groups,)
+        
+    Returns:
+        Tuple of (coef, intercept, r2) with one entry per group
+    """
+    coef = np.einsum("gij,gj->gi", np.linalg.pinv(xtx, hermitian=True), xty)
+    intercept = y_mean - np.einsum("gi,gi->g", x_mean, coef)
+    
+    # Residual sum of squares of a least squares fit is yᵀy - βᵀXᵀy
+    ss_res = np.maximum(yty - np.einsum("gi,gi->g", coef, xty), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(yty > 0, 1 - ss_res / yty, np.where(ss_res > 0, 0.0, 1.0))
+    
+    return coef, intercept, r2
+
 def get_category_trends(db: Session, user_id: int, category: str, months: int = 6) -> Dict[str, Any]:
     """
     Get spending trends for a specific category over recent months
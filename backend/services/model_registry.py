@@ -0,0 +1,127 @@
+import os
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.base import Category, ModelRegistryEntry
+from services.cache import LRUCache
+from services.ml_predictor import FittedModel
+
+# Hot models kept in process memory, keyed by (user_id, category, data_version)
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "1024"))
+
+_cache = LRUCache(maxsize=MODEL_CACHE_SIZE)
+
+def get_models(db: Session, user_id: int, versions: Dict[Category, int]) -> Dict[Category, FittedModel]:
+    """
+    Look up fitted models that are current for the given data versions
+
+    Checks the in-process LRU first and falls back to the model_registry table.
+
+    Args:
+        db: Database session
+        user_id: Owner of the models
+        versions: Current data version of each requested category
+
+    Returns:
+        Dictionary of the categories that have an up-to-date stored model
+    """
+    models = {}
+    missing = []
+    for category, version in versions.items():
+        model = _cache.get((user_id, category, version))
+        if model is None:
+            missing.append(category)
+        else:
+            models[category] = model
+
+    if missing:
+        entries = db.query(ModelRegistryEntry).filter(
+            ModelRegistryEntry.user_id == user_id,
+            ModelRegistryEntry.category.in_(missing)
+        ).all()
+        for entry in entries:
+            if entry.data_version == versions[entry.category]:
+                model = _to_model(entry)
+                _cache.set((user_id, entry.category, entry.data_version), model)
+                models[entry.category] = model
+
+    return models
+
+def save_models(
+    db: Session,
+    user_id: int,
+    models: Dict[Category, FittedModel],
+    versions: Dict[Category, int],
+    commit: bool = True
+) -> None:
+    """
+    Store freshly fitted models for their data versions and commit
+
+    Args:
+        db: Database session
+        user_id: Owner of the models
+        models: Fitted model per category
+        versions: Data version each model was fitted on
+        commit: Commit here; False leaves the models in the caller's transaction
+    """
+    entries = {
+        entry.category: entry
+        for entry in db.query(ModelRegistryEntry).filter(
+            ModelRegistryEntry.user_id == user_id,
+            ModelRegistryEntry.category.in_(list(models))
+        )
+    }
+
+    for category, model in models.items():
+        version = versions[category]
+        _cache.set((user_id, category, version), model)
+
+        entry = entries.get(category)
+        if entry is not None and entry.data_version > version:
+            # A newer model was stored concurrently
+            continue
+
+        try:
+            with db.begin_nested():
+                if entry is None:
+                    entry = ModelRegistryEntry(user_id=user_id, category=category)
+                    db.add(entry)
+                entry.data_version = version
+                entry.coef = [float(value) for value in model.coef]
+                entry.intercept = model.intercept
+                entry.r2 = model.r2
+                entry.first_date = model.first_date
+                entry.last_date = model.last_date
+                entry.recent_average = model.recent_average
+                entry.data_points = model.data_points
+                entry.fitted_at = datetime.utcnow()
+        except IntegrityError:
+            # Another request stored the first model of this series concurrently
+            pass
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+def _to_model(entry: ModelRegistryEntry) -> FittedModel:
+    return FittedModel(
+        coef=list(entry.coef),
+        intercept=entry.intercept,
+        r2=entry.r2,
+        first_date=entry.first_date,
+        last_date=entry.last_date,
+        recent_average=entry.recent_average,
+        data_points=entry.data_points
+    )
+
+def cache_stats() -> Dict[str, float]:
+    """Hit/miss counters of the in-process model cache"""
+    return _cache.stats()
+
+def clear_cache() -> None:
+    """Drop all in-process models (stored models are kept)"""
+    _cache.clear()
@@ -0,0 +1,177 @@
+import argparse
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Integer, cast, extract, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.base import Expense, ExpenseMonthlyRollup
+
+def apply_changes(db: Session, user_id: int, changes: Sequence[tuple]) -> None:
+    """
+    Add inserted expenses to and subtract deleted expenses from the monthly rollup
+
+    An expense moved to another month or category is subtracted from its old
+    row and added to its new one. Rows whose count drops to zero are removed.
+
+    Args:
+        db: Database session (not committed here)
+        user_id: Owner of the changed expenses
+        changes: (old, new) ExpenseSnapshot pairs, either side may be None
+    """
+    deltas = defaultdict(lambda: [0.0, 0])
+    for old, new in changes:
+        if old is not None:
+            delta = deltas[(old.date.year, old.date.month, old.category)]
+            delta[0] -= old.amount
+            delta[1] -= 1
+        if new is not None:
+            delta = deltas[(new.date.year, new.date.month, new.category)]
+            delta[0] += new.amount
+            delta[1] += 1
+
+    # Sorted so concurrent writers lock rows in the same order
+    rows = [
+        {"user_id": user_id, "year": year, "month": month, "category": category, "total": total, "count": count}
+        for (year, month, category), (total, count) in sorted(deltas.items(), key=lambda item: (item[0][0], item[0][1], item[0][2].name))
+        if total or count
+    ]
+    if not rows:
+        return
+
+    # Relative increments in one upsert, so concurrent writers never lose each other's updates
+    statement = _insert(db)(ExpenseMonthlyRollup).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "year", "month", "category"],
+        set_={
+            "total": ExpenseMonthlyRollup.total + statement.excluded.total,
+            "count": ExpenseMonthlyRollup.count + statement.excluded.count
+        }
+    ))
+
+    if any(row["count"] < 0 for row in rows):
+        db.query(ExpenseMonthlyRollup).filter(
+            ExpenseMonthlyRollup.user_id == user_id,
+            ExpenseMonthlyRollup.count <= 0
+        ).delete(synchronize_session=False)
+
+def _insert(db: Session):
+    """The dialect-specific insert construct that supports ON CONFLICT"""
+    return sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+
+def _expense_totals(db: Session, user_id: Optional[int] = None):
+    """Query of (user_id, year, month, category, total, count) aggregated from the expenses table"""
+    year = cast(extract("year", Expense.date), Integer).label("year")
+    month = cast(extract("month", Expense.date), Integer).label("month")
+    query = db.query(
+        Expense.user_id,
+        year,
+        month,
+        Expense.category,
+        func.sum(Expense.amount).label("total"),
+        func.count(Expense.id).label("count")
+    ).filter(
+        Expense.user_id.isnot(None),
+        Expense.date.isnot(None)
+    )
+    if user_id is not None:
+        query = query.filter(Expense.user_id == user_id)
+    return query.group_by(Expense.user_id, year, month, Expense.category)
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the monthly rollup from the expenses table and commit
+
+    Args:
+        db: Database session
+        user_id: Only rebuild this user's rows (all users by default)
+
+    Returns:
+        Number of rollup rows written
+    """
+    rollup_query = db.query(ExpenseMonthlyRollup)
+    if user_id is not None:
+        rollup_query = rollup_query.filter(ExpenseMonthlyRollup.user_id == user_id)
+    rollup_query.delete(synchronize_session=False)
+
+    result = db.execute(
+        ExpenseMonthlyRollup.__table__.insert().from_select(
+            ["user_id", "year", "month", "category", "total", "count"],
+            _expense_totals(db, user_id).subquery().select()
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+def check_consistency(db: Session, user_id: Optional[int] = None, tolerance: float = 0.01) -> List[Dict[str, Any]]:
+    """
+    Compare the monthly rollup with totals aggregated from the expenses table
+
+    Args:
+        db: Database session
+        user_id: Only check this user (all users by default)
+        tolerance: Largest accepted absolute difference of a total
+
+    Returns:
+        List of mismatches, empty when the rollup is consistent
+    """
+    expected = {
+        (row.user_id, row.year, row.month, row.category): (float(row.total), row.count)
+        for row in _expense_totals(db, user_id)
+    }
+    rollup_query = db.query(ExpenseMonthlyRollup)
+    if user_id is not None:
+        rollup_query = rollup_query.filter(ExpenseMonthlyRollup.user_id == user_id)
+    actual = {
+        (row.user_id, row.year, row.month, row.category): (row.total, row.count)
+        for row in rollup_query
+    }
+
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys(), key=lambda key: (key[0], key[1], key[2], key[3].name)):
+        expected_total, expected_count = expected.get(key, (0.0, 0))
+        actual_total, actual_count = actual.get(key, (0.0, 0))
+        if expected_count != actual_count or abs(expected_total - actual_total) > tolerance:
+            uid, year, month, category = key
+            mismatches.append({
+                "user_id": uid,
+                "year": year,
+                "month": month,
+                "category": category.value,
+                "expenses": (expected_total, expected_count),
+                "rollup": (actual_total, actual_count)
+            })
+    return mismatches
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m services.monthly_rollup {rebuild,check}"""
+    parser = argparse.ArgumentParser(description="Maintain the monthly expense rollup")
+    parser.add_argument("command", choices=["rebuild", "check"], help="rebuild the rollup from expenses or check it against them")
+    parser.add_argument("--user-id", type=int, default=None, help="only process this user")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="accepted difference of a total for check")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild(db, args.user_id)
+            print(f"Rebuilt {written} monthly rollup rows")
+            return 0
+
+        mismatches = check_consistency(db, args.user_id, args.tolerance)
+        for mismatch in mismatches:
+            print(
+                f"user {mismatch['user_id']} {mismatch['year']}-{mismatch['month']:02d} {mismatch['category']}: "
+                f"expenses={mismatch['expenses']} rollup={mismatch['rollup']}"
+            )
+        print(f"{len(mismatches)} inconsistent rollup rows")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
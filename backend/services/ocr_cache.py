@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# OCR results are cached on local disk so a re-uploaded receipt skips the paid provider call.
+# Every worker process on a host shares the file; 0 entries disables the cache.
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(tempfile.gettempdir(), "ocr_cache.sqlite3"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "10000"))
+OCR_CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", str(30 * 24 * 60 * 60)))
+
+_connection: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+_errors = 0
+
+def cache_key(image: bytes, provider: str, prompt_version: str) -> str:
+    """Content address of an extraction: the image digest plus what produced the result"""
+    return f"{provider}:{prompt_version}:{hashlib.sha256(image).hexdigest()}"
+
+def _connect() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(OCR_CACHE_PATH, timeout=5, check_same_thread=False, isolation_level=None)
+        # WAL lets the workers read while one of them writes
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS ix_ocr_results_accessed_at ON ocr_results (accessed_at)")
+    return _connection
+
+def get_result(key: str) -> Optional[Dict[str, Any]]:
+    """Return the cached result for a key, or None if missing, expired or unreadable"""
+    global _hits, _misses, _errors
+    if OCR_CACHE_MAX_ENTRIES <= 0:
+        return None
+    now = time.time()
+    with _lock:
+        try:
+            db = _connect()
+            row = db.execute(
+                "SELECT result FROM ocr_results WHERE key = ? AND created_at >= ?",
+                (key, now - OCR_CACHE_TTL)
+            ).fetchone()
+            if row is None:
+                _misses += 1
+                return None
+            db.execute("UPDATE ocr_results SET accessed_at = ? WHERE key = ?", (now, key))
+            _hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            # A broken cache must never fail the extraction itself
+            _errors += 1
+            _misses += 1
+            logger.warning("OCR cache read failed: %s", e)
+            return None
+
+def save_result(key: str, result: Dict[str, Any]) -> None:
+    """Store a result, evicting expired and then least recently used entries over the limit"""
+    global _errors
+    if OCR_CACHE_MAX_ENTRIES <= 0:
+        return
+    now = time.time()
+    with _lock:
+        try:
+            db = _connect()
+            db.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, result, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now)
+            )
+            db.execute("DELETE FROM ocr_results WHERE created_at < ?", (now - OCR_CACHE_TTL,))
+            db.execute(
+                "DELETE FROM ocr_results WHERE key IN ("
+                "SELECT key FROM ocr_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (OCR_CACHE_MAX_ENTRIES,)
+            )
+        except sqlite3.Error as e:
+            _errors += 1
+            logger.warning("OCR cache write failed: %s", e)
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss counters of this process and the current size of the shared cache"""
+    with _lock:
+        size = None
+        if OCR_CACHE_MAX_ENTRIES > 0:
+            try:
+                size = _connect().execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        lookups = _hits + _misses
+        return {
+            "hits": _hits,
+            "misses": _misses,
+            "hit_rate": _hits / lookups if lookups else 0.0,
+            "errors": _errors,
+            "size": size,
+            "maxsize": OCR_CACHE_MAX_ENTRIES
+        }
+
+def clear() -> None:
+    """Remove all cached results"""
+    with _lock:
+        if OCR_CACHE_MAX_ENTRIES > 0:
+            _connect().execute("DELETE FROM ocr_results")
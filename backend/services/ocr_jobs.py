@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.base import OCRJob
+from services.ocr_service import extract_from_image
+
+logger = logging.getLogger(__name__)
+
+# Background OCR workers per API process (0 leaves the queue to `python -m services.ocr_jobs work`,
+# the default on serverless platforms where nothing runs between requests)
+OCR_JOB_WORKERS = int(os.getenv("OCR_JOB_WORKERS", "0" if os.getenv("VERCEL") else "2"))
+# Provider attempts per job before it fails
+OCR_JOB_MAX_ATTEMPTS = int(os.getenv("OCR_JOB_MAX_ATTEMPTS", "3"))
+# Seconds before the first retry, doubled for every further one
+OCR_JOB_RETRY_DELAY = float(os.getenv("OCR_JOB_RETRY_DELAY", "10"))
+# Seconds an idle worker waits before looking for jobs queued by another process
+OCR_JOB_POLL_INTERVAL = float(os.getenv("OCR_JOB_POLL_INTERVAL", "2"))
+# Seconds after which a running job is assumed lost with its worker and claimed again
+OCR_JOB_STALE_AFTER = float(os.getenv("OCR_JOB_STALE_AFTER", "300"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+class ClaimedJob(NamedTuple):
+    """What a worker needs of a job it has claimed"""
+    id: int
+    image: bytes
+    content_type: str
+    attempts: int
+
+_workers: List["asyncio.Task[None]"] = []
+_wakeup: Optional[asyncio.Event] = None
+_busy = 0
+_succeeded = 0
+_failed = 0
+_retried = 0
+
+def _session() -> AsyncSession:
+    from database import AsyncSessionLocal, get_async_engine
+    return AsyncSessionLocal(bind=get_async_engine())
+
+async def enqueue(db: AsyncSession, user_id: int, image: bytes, content_type: str, filename: Optional[str] = None) -> OCRJob:
+    """
+    Queue a receipt for background OCR and commit
+
+    Args:
+        db: Async database session
+        user_id: Owner of the job
+        image: Receipt image bytes
+        content_type: MIME type of the image
+        filename: Name of the uploaded file
+
+    Returns:
+        The queued job
+    """
+    job = OCRJob(user_id=user_id, status=QUEUED, filename=filename, content_type=content_type, image=image, attempts=0)
+    db.add(job)
+    await db.commit()
+    # Wake an idle worker of this process instead of waiting for its next poll
+    if _wakeup is not None:
+        _wakeup.set()
+    return job
+
+async def get_job(db: AsyncSession, user_id: int, job_id: int) -> Optional[OCRJob]:
+    """Return a user's job, or None if it does not exist or belongs to someone else"""
+    return (await db.execute(
+        select(OCRJob).where(OCRJob.id == job_id, OCRJob.user_id == user_id)
+    )).scalar_one_or_none()
+
+async def claim_job() -> Optional[ClaimedJob]:
+    """
+    Mark the oldest due job as running and return it, or None if the queue is empty
+
+    Jobs left running longer than OCR_JOB_STALE_AFTER (their worker died) are
+    claimed again. SKIP LOCKED lets any number of workers, in any process,
+    claim concurrently without handing out the same job twice.
+    """
+    now = datetime.utcnow()
+    async with _session() as db:
+        job = (await db.execute(
+            select(OCRJob)
+            .where(or_(
+                and_(OCRJob.status == QUEUED, OCRJob.next_attempt_at <= now),
+                and_(OCRJob.status == RUNNING, OCRJob.started_at < now - timedelta(seconds=OCR_JOB_STALE_AFTER))
+            ))
+            .order_by(OCRJob.next_attempt_at, OCRJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalar_one_or_none()
+        if job is None:
+            return None
+        claimed = ClaimedJob(job.id, job.image, job.content_type, job.attempts + 1)
+        # Conditional on the row being unchanged, so the claim also holds where
+        # SKIP LOCKED is not supported (SQLite)
+        result = await db.execute(
+            update(OCRJob)
+            .where(OCRJob.id == job.id, OCRJob.status == job.status, OCRJob.attempts == job.attempts)
+            .values(status=RUNNING, attempts=claimed.attempts, started_at=now)
+        )
+        await db.commit()
+        return claimed if result.rowcount == 1 else None
+
+async def _finish(job: ClaimedJob, **values: Any) -> bool:
+    """Store the outcome of a claim, unless the job was claimed again meanwhile"""
+    async with _session() as db:
+        finished = await db.execute(
+            update(OCRJob)
+            .where(OCRJob.id == job.id, OCRJob.status == RUNNING, OCRJob.attempts == job.attempts)
+            .values(**values)
+        )
+        await db.commit()
+        return finished.rowcount == 1
+
+async def process_job(job: ClaimedJob) -> None:
+    """Run a claimed job through the OCR service and store its result, retry or failure"""
+    global _succeeded, _failed, _retried
+    try:
+        if job.attempts > OCR_JOB_MAX_ATTEMPTS:
+            raise RuntimeError("Worker stopped while processing the job")
+        result = await extract_from_image(job.image, job.content_type, raise_errors=True)
+    except Exception as e:
+        if job.attempts >= OCR_JOB_MAX_ATTEMPTS:
+            logger.warning("OCR job %s failed after %s attempts: %s", job.id, job.attempts, e)
+            if await _finish(job, status=FAILED, error=str(e), image=None, finished_at=datetime.utcnow()):
+                _failed += 1
+        else:
+            delay = OCR_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            if await _finish(job, status=QUEUED, error=str(e), next_attempt_at=datetime.utcnow() + timedelta(seconds=delay)):
+                _retried += 1
+        return
+    if await _finish(job, status=SUCCEEDED, result=result, error=None, image=None, finished_at=datetime.utcnow()):
+        _succeeded += 1
+
+async def _work() -> None:
+    """Worker loop: claim and process jobs until cancelled"""
+    global _busy
+    while True:
+        try:
+            job = await claim_job()
+        except Exception as e:
+            logger.error("Claiming an OCR job failed: %s", e)
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), OCR_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+        _busy += 1
+        try:
+            await process_job(job)
+        except Exception as e:
+            # The job stays running and is claimed again once stale
+            logger.error("Processing OCR job %s failed: %s", job.id, e)
+        finally:
+            _busy -= 1
+
+def start(workers: int = OCR_JOB_WORKERS) -> None:
+    """Start the background workers on the running event loop"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    for _ in range(workers):
+        _workers.append(asyncio.create_task(_work()))
+
+async def shutdown() -> None:
+    """Stop the background workers (a job they were processing is claimed again once stale)"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+async def stats() -> Dict[str, Any]:
+    """Queue depth by status, shared by all processes, and the counters of this process's workers"""
+    queue: Dict[str, Optional[int]] = {QUEUED: 0, RUNNING: 0}
+    try:
+        async with _session() as db:
+            rows = await db.execute(
+                select(OCRJob.status, func.count(OCRJob.id))
+                .where(OCRJob.status.in_([QUEUED, RUNNING]))
+                .group_by(OCRJob.status)
+            )
+            queue.update(dict(rows.all()))
+    except Exception as e:
+        logger.warning("Counting OCR jobs failed: %s", e)
+        queue = {QUEUED: None, RUNNING: None}
+    return {
+        "queued": queue[QUEUED],
+        "running": queue[RUNNING],
+        "workers": len(_workers),
+        "busy": _busy,
+        "succeeded": _succeeded,
+        "failed": _failed,
+        "retried": _retried
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m services.ocr_jobs work"""
+    parser = argparse.ArgumentParser(description="Process the background OCR job queue")
+    parser.add_argument("command", choices=["work"], help="run workers until interrupted")
+    parser.add_argument("--workers", type=int, default=max(OCR_JOB_WORKERS, 1), help="concurrent jobs")
+    args = parser.parse_args(argv)
+
+    async def work() -> None:
+        from database import dispose_async_engine
+        from services.ocr_service import close_client
+
+        start(args.workers)
+        try:
+            await asyncio.gather(*_workers)
+        finally:
+            await shutdown()
+            await close_client()
+            await dispose_async_engine()
+
+    try:
+        asyncio.run(work())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
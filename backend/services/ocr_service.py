@@ -1,17 +1,68 @@
+import asyncio
 import os
 import base64
-import re
-from typing import Dict, Any
-from PIL import Image
-import requests
+from typing import TYPE_CHECKING, Dict, Any, Optional
 import json
 
+from starlette.concurrency import run_in_threadpool
+
+from services import ocr_cache
+from services.image_preprocessing import normalize_image, settings_tag
+from services.receipt_text import analyze
+
+if TYPE_CHECKING:
+    import httpx
+
 # Get API keys from environment
 LLM7_API_KEY = os.getenv("LLM7_API_KEY", "unused")  # Default to "unused" as per example
 GOOGLE_CLOUD_API_KEY = os.getenv("GOOGLE_CLOUD_API_KEY")
 AZURE_VISION_API_KEY = os.getenv("AZURE_VISION_API_KEY")
 AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")
 
+# Provider base URLs (overridable, e.g. to point at a local stub server in tests)
+LLM7_BASE_URL = os.getenv("LLM7_BASE_URL", "https://api.llm7.io/v1")
+GOOGLE_VISION_BASE_URL = os.getenv("GOOGLE_VISION_BASE_URL", "https://vision.googleapis.com/v1")
+
+# Identifies the prompt and result parsing in the OCR cache key; bump it whenever
+# either changes so results produced the old way are not served
+OCR_PROMPT_VERSION = "2"
+
+# Provider HTTP client settings
+OCR_CONNECT_TIMEOUT = float(os.getenv("OCR_CONNECT_TIMEOUT", "5"))
+OCR_READ_TIMEOUT = float(os.getenv("OCR_READ_TIMEOUT", "60"))
+# Provider calls in flight per worker; further uploads wait for a slot
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "8"))
+
+_client: Optional["httpx.AsyncClient"] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def get_client() -> "httpx.AsyncClient":
+    """Return the shared provider HTTP client, creating it on first use"""
+    global _client
+    if _client is None:
+        # Imported here to keep httpx out of the API's cold start
+        import httpx
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OCR_READ_TIMEOUT, connect=OCR_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=OCR_MAX_CONCURRENCY, max_keepalive_connections=OCR_MAX_CONCURRENCY)
+        )
+    return _client
+
+async def close_client() -> None:
+    """Close the shared provider HTTP client and its keep-alive connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def post(url: str, **kwargs: Any) -> "httpx.Response":
+    """POST to a provider through the shared client, at most OCR_MAX_CONCURRENCY at a time"""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(OCR_MAX_CONCURRENCY)
+    async with _semaphore:
+        return await get_client().post(url, **kwargs)
+
 def get_available_service():
     """Check which AI service is available"""
     if LLM7_API_KEY:
@@ -23,12 +74,15 @@ def get_available_service():
     else:
         return None
 
-def extract_from_image(image_path: str) -> Dict[str, Any]:
+async def extract_from_image(image: bytes, content_type: str = "image/jpeg", raise_errors: bool = False) -> Dict[str, Any]:
     """
     Extract text and structured data from receipt image using cloud AI services
     
     Args:
-        image_path: Path to the receipt image
+        image: Receipt image bytes, straight from the upload
+        content_type: MIME type of the image
+        raise_errors: Raise provider failures instead of returning them as an
+            error result (used by the OCR job queue to retry them)
         
     Returns:
         Dictionary containing extracted data with keys:
@@ -47,21 +101,28 @@ def extract_from_image(image_path: str) -> Dict[str, Any]:
             "raw_text": "No AI service configured. Please add an API key to your .env file (LLM7_API_KEY, GOOGLE_CLOUD_API_KEY, or AZURE_VISION_API_KEY)"
         }
     
+    # Identical images (re-uploads, retries) are answered from the OCR cache
+    key, cached = await run_in_threadpool(_cached_result, image, service)
+    if cached is not None:
+        return cached
+    
     try:
-        if service == "llm7":
-            return extract_with_llm7(image_path)
-        elif service == "google":
-            return extract_with_google_vision(image_path)
-        elif service == "azure":
-            return extract_with_azure_vision(image_path)
-        else:
+        # Downscale and re-encode the photo before it is base64-encoded and uploaded
+        normalized = await run_in_threadpool(normalize_image, image, content_type)
+        result = await extract_with_service(service, normalized.data, normalized.content_type)
+        if result is None:
             return {
                 "amount": 0.0,
                 "category": "other",
                 "confidence": 0.0,
                 "raw_text": "Unsupported AI service"
             }
+        # Failures are never cached, so a retry reaches the provider again
+        await run_in_threadpool(ocr_cache.save_result, key, result)
+        return result
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error processing image with {service}: {e}")
         return {
             "amount": 0.0,
@@ -70,12 +131,27 @@ def extract_from_image(image_path: str) -> Dict[str, Any]:
             "raw_text": f"Error: {str(e)}"
         }
 
-def extract_with_llm7(image_path: str) -> Dict[str, Any]:
+async def extract_with_service(service: str, image: bytes, content_type: str = "image/jpeg") -> Optional[Dict[str, Any]]:
+    """Send an image to one provider as is, bypassing the cache; None for an unknown service"""
+    if service == "llm7":
+        return await extract_with_llm7(image, content_type)
+    elif service == "google":
+        return await extract_with_google_vision(image)
+    elif service == "azure":
+        return await extract_with_azure_vision(image)
+    return None
+
+def _cached_result(image: bytes, service: str) -> tuple:
+    """Hash the image and look it up in the OCR cache (blocking, run in the threadpool)"""
+    # The normalization settings change what the provider sees, so they are part of the key
+    key = ocr_cache.cache_key(image, service, f"{OCR_PROMPT_VERSION}/{settings_tag()}")
+    return key, ocr_cache.get_result(key)
+
+async def extract_with_llm7(image: bytes, content_type: str = "image/jpeg") -> Dict[str, Any]:
     """Extract text from image using LLM7.io API"""
     try:
-        # Convert image to base64
-        with open(image_path, "rb") as image_file:
-            base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+        # Encode the image for the data URL
+        base64_image = base64.b64encode(image).decode('ascii')
         
         headers = {
             "Content-Type": "application/json"
@@ -102,7 +178,7 @@ Focus on finding the total amount and categorize the expense based on the mercha
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{content_type};base64,{base64_image}"
                             }
                         }
                     ]
@@ -111,8 +187,8 @@ Focus on finding the total amount and categorize the expense based on the mercha
             "max_tokens": 500
         }
         
-        response = requests.post(
-            "https://api.llm7.io/v1/chat/completions",
+        response = await post(
+            f"{LLM7_BASE_URL}/chat/completions",
             headers=headers,
             json=payload
         )
@@ -127,11 +203,10 @@ Focus on finding the total amount and categorize the expense based on the mercha
                 return extracted_data
             except:
                 # Fallback: extract amount from text
-                amount = extract_amount(content)
-                category = categorize_expense(content)
+                analysis = analyze(content)
                 return {
-                    "amount": amount,
-                    "category": category,
+                    "amount": analysis.amount,
+                    "category": analysis.category,
                     "confidence": 0.7,
                     "raw_text": content
                 }
@@ -139,14 +214,13 @@ Focus on finding the total amount and categorize the expense based on the mercha
             raise Exception(f"LLM7 API error: {response.status_code} - {response.text}")
             
     except Exception as e:
-        raise Exception(f"LLM7 extraction failed: {str(e)}")
+        raise Exception(f"LLM7 extraction failed: {str(e) or type(e).__name__}")
 
-def extract_with_google_vision(image_path: str) -> Dict[str, Any]:
+async def extract_with_google_vision(image: bytes) -> Dict[str, Any]:
     """Extract text from image using Google Cloud Vision API"""
     try:
-        # Convert image to base64
-        with open(image_path, "rb") as image_file:
-            content = base64.b64encode(image_file.read()).decode('utf-8')
+        # Encode the image for the JSON payload
+        content = base64.b64encode(image).decode('ascii')
         
         headers = {
             "Content-Type": "application/json"
@@ -167,8 +241,8 @@ def extract_with_google_vision(image_path: str) -> Dict[str, Any]:
             ]
         }
         
-        response = requests.post(
-            f"https://vision.googleapis.com/v1/images:annotate?key={GOOGLE_CLOUD_API_KEY}",
+        response = await post(
+            f"{GOOGLE_VISION_BASE_URL}/images:annotate?key={GOOGLE_CLOUD_API_KEY}",
             headers=headers,
             json=payload
         )
@@ -177,12 +251,11 @@ def extract_with_google_vision(image_path: str) -> Dict[str, Any]:
             result = response.json()
             text = result['responses'][0]['fullTextAnnotation']['text']
             
-            amount = extract_amount(text)
-            category = categorize_expense(text)
+            analysis = analyze(text)
             
             return {
-                "amount": amount,
-                "category": category,
+                "amount": analysis.amount,
+                "category": analysis.category,
                 "confidence": 0.8,
                 "raw_text": text
             }
@@ -190,24 +263,21 @@ def extract_with_google_vision(image_path: str) -> Dict[str, Any]:
             raise Exception(f"Google Vision API error: {response.status_code} - {response.text}")
             
     except Exception as e:
-        raise Exception(f"Google Vision extraction failed: {str(e)}")
+        raise Exception(f"Google Vision extraction failed: {str(e) or type(e).__name__}")
 
-def extract_with_azure_vision(image_path: str) -> Dict[str, Any]:
+async def extract_with_azure_vision(image: bytes) -> Dict[str, Any]:
     """Extract text from image using Azure Computer Vision API"""
     try:
-        # Convert image to base64
-        with open(image_path, "rb") as image_file:
-            content = base64.b64encode(image_file.read()).decode('utf-8')
-        
         headers = {
             "Ocp-Apim-Subscription-Key": AZURE_VISION_API_KEY,
             "Content-Type": "application/octet-stream"
         }
         
-        response = requests.post(
+        response = await post(
             f"{AZURE_VISION_ENDPOINT}vision/v3.2/ocr",
             headers=headers,
-            data=content
+            # The OCR endpoint takes the raw image bytes as the body
+            content=bytes(image)
         )
         
         if response.status_code == 200:
@@ -222,12 +292,11 @@ def extract_with_azure_vision(image_path: str) -> Dict[str, Any]:
             
             text = '\n'.join(text_lines)
             
-            amount = extract_amount(text)
-            category = categorize_expense(text)
+            analysis = analyze(text)
             
             return {
-                "amount": amount,
-                "category": category,
+                "amount": analysis.amount,
+                "category": analysis.category,
                 "confidence": 0.8,
                 "raw_text": text
             }
@@ -235,49 +304,4 @@ def extract_with_azure_vision(image_path: str) -> Dict[str, Any]:
             raise Exception(f"Azure Vision API error: {response.status_code} - {response.text}")
             
     except Exception as e:
-        raise Exception(f"Azure Vision extraction failed: {str(e)}")
-
-def extract_amount(text: str) -> float:
-    """Extract monetary amount from text using regex"""
-    # Look for patterns like $12.34, 12.34, 12,34, etc.
-    amount_patterns = [
-        r'\$?(\d+(?:,\d{3})*(?:\.\d{2})?)',  # $1,234.56 or 1,234.56
-        r'(\d+(?:\.\d{2})?)\s*(?:USD|dollars?)',  # 12.34 USD
-        r'total[:\s]*\$?(\d+(?:\.\d{2})?)',  # total: $12.34
-        r'amount[:\s]*\$?(\d+(?:\.\d{2})?)',  # amount: $12.34
-    ]
-    
-    for pattern in amount_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            # Clean up the amount string and convert to float
-            amount_str = matches[0].replace(',', '')
-            try:
-                return float(amount_str)
-            except ValueError:
-                continue
-    
-    return 0.0
-
-def categorize_expense(text: str) -> str:
-    """Categorize expense based on keywords in extracted text"""
-    text_lower = text.lower()
-    
-    # Category keywords
-    categories = {
-        "food": ["restaurant", "food", "dining", "meal", "lunch", "dinner", "breakfast", "cafe", "coffee", "pizza", "burger"],
-        "travel": ["hotel", "flight", "airline", "taxi", "uber", "lyft", "rental car", "gas", "parking", "airport"],
-        "entertainment": ["movie", "theater", "concert", "show", "ticket", "netflix", "spotify", "game"],
-        "shopping": ["store", "retail", "clothing", "shoes", "electronics", "amazon", "walmart", "target"],
-        "healthcare": ["pharmacy", "medical", "doctor", "hospital", "clinic", "medicine", "health"],
-        "utilities": ["electric", "water", "gas", "internet", "phone", "cable", "utility"],
-        "education": ["book", "course", "tuition", "school", "university", "education"]
-    }
-    
-    # Check for category keywords
-    for category, keywords in categories.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                return category
-    
-    return "other"
+        raise Exception(f"Azure Vision extraction failed: {str(e) or type(e).__name__}")
@@ -0,0 +1,136 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models.base import Category, CategoryRegressionState, Prediction
+from services.forecasting import FORECAST_MODE, ForecastMode, predict_for_user, predict_for_user_async
+from services.ml_predictor import CATEGORIES
+
+# Precomputed predictions older than this are recomputed live
+PREDICTION_MAX_AGE = int(os.getenv("PREDICTION_MAX_AGE", str(24 * 60 * 60)))
+
+async def get_predictions(
+    db: Session,
+    user_id: int,
+    categories: Optional[List[Category]] = None,
+    mode: Optional[ForecastMode] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Serve precomputed predictions when fresh, computing the rest live
+
+    A precomputed prediction is fresh when it is younger than
+    PREDICTION_MAX_AGE and no expense of its category changed since.
+    Live predictions go through predict_for_user_async and may raise its
+    PoolSaturated or asyncio.TimeoutError.
+
+    Args:
+        db: Database session
+        user_id: User ID to predict for
+        categories: Categories to predict (all by default)
+        mode: Forecast mode (FORECAST_MODE by default)
+
+    Returns:
+        Dictionary mapping each category value to a prediction result
+    """
+    categories = categories or CATEGORIES
+    mode = mode or FORECAST_MODE
+
+    results = await run_in_threadpool(load_fresh_predictions, db, user_id, categories, mode)
+    stale = [category for category in categories if category.value not in results]
+    if stale:
+        results.update(await predict_for_user_async(db, user_id, stale, mode))
+    return results
+
+def load_fresh_predictions(
+    db: Session,
+    user_id: int,
+    categories: List[Category],
+    mode: ForecastMode
+) -> Dict[str, Dict[str, Any]]:
+    """Precomputed predictions that are still valid, keyed by category value"""
+    cutoff = datetime.utcnow() - timedelta(seconds=PREDICTION_MAX_AGE)
+    rows = db.query(Prediction, CategoryRegressionState.version).outerjoin(
+        CategoryRegressionState,
+        and_(
+            CategoryRegressionState.user_id == Prediction.user_id,
+            CategoryRegressionState.category == Prediction.category
+        )
+    ).filter(
+        Prediction.user_id == user_id,
+        Prediction.mode == mode.value,
+        Prediction.category.in_(categories),
+        Prediction.computed_at >= cutoff
+    ).all()
+
+    fresh = {}
+    for prediction, version in rows:
+        if prediction.data_version != (version or 0):
+            continue
+        result = {
+            "predicted_overspend": prediction.predicted_overspend,
+            "confidence": prediction.confidence,
+            "data_points": prediction.data_points
+        }
+        if prediction.prediction is not None:
+            result["prediction"] = prediction.prediction
+            result["recent_average"] = prediction.recent_average
+        fresh[prediction.category.value] = result
+    return fresh
+
+def compute_and_store(db: Session, user_id: int, mode: Optional[ForecastMode] = None) -> int:
+    """
+    Compute live predictions for every category and upsert them
+
+    The caller commits, including the models fitted on the way. Data
+    versions are read before predicting, so an expense written meanwhile
+    makes the stored rows stale rather than wrong.
+
+    Returns:
+        Number of prediction rows written
+    """
+    mode = mode or FORECAST_MODE
+    versions = dict(
+        db.query(CategoryRegressionState.category, CategoryRegressionState.version).filter(
+            CategoryRegressionState.user_id == user_id
+        ).all()
+    )
+    results = predict_for_user(db, user_id, CATEGORIES, mode, commit=False)
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "category": category,
+            "mode": mode.value,
+            "predicted_overspend": results[category.value].get("predicted_overspend", 0.0),
+            "confidence": results[category.value].get("confidence", 0.0),
+            "data_points": results[category.value].get("data_points", 0),
+            "prediction": results[category.value].get("prediction"),
+            "recent_average": results[category.value].get("recent_average"),
+            "data_version": versions.get(category, 0),
+            "computed_at": now
+        }
+        for category in CATEGORIES
+        # Failed predictions are left to the live path
+        if "error" not in results[category.value]
+    ]
+    if not rows:
+        return 0
+
+    statement = insert(Prediction).values(rows)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "category", "mode"],
+        set_={
+            column: statement.excluded[column]
+            for column in (
+                "predicted_overspend", "confidence", "data_points", "prediction",
+                "recent_average", "data_version", "computed_at"
+            )
+        }
+    ))
+    return len(rows)
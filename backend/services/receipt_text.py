@@ -0,0 +1,177 @@
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# Keywords per category with their weight. A keyword shared by categories ("gas" is
+# both fuel and a utility bill) counts for each, at a lower weight, so the other
+# words on the receipt decide.
+CATEGORY_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "food": {
+        "restaurant": 2, "food": 1, "dining": 2, "meal": 1, "lunch": 1, "dinner": 1, "breakfast": 1,
+        "cafe": 2, "coffee": 2, "pizza": 2, "burger": 2, "bakery": 2, "grill": 1, "kitchen": 1,
+        "espresso": 2, "latte": 2, "sandwich": 2, "grocery": 2, "supermarket": 2
+    },
+    "travel": {
+        "hotel": 2, "flight": 2, "airline": 2, "airlines": 2, "taxi": 2, "uber": 2, "lyft": 2,
+        "rental car": 2, "car rental": 2, "gas": 0.5, "fuel": 2, "gasoline": 2, "petrol": 2, "diesel": 2,
+        "parking": 2, "airport": 2, "boarding pass": 2, "train": 1, "railway": 2
+    },
+    "entertainment": {
+        "movie": 2, "cinema": 2, "theater": 2, "theatre": 2, "concert": 2, "show": 1, "ticket": 1,
+        "netflix": 2, "spotify": 2, "game": 1, "museum": 2
+    },
+    "shopping": {
+        "store": 1, "retail": 1, "clothing": 2, "apparel": 2, "shoes": 2, "electronics": 2,
+        "amazon": 2, "walmart": 2, "target": 2, "mall": 1
+    },
+    "healthcare": {
+        "pharmacy": 2, "medical": 2, "doctor": 2, "hospital": 2, "clinic": 2, "medicine": 2,
+        "health": 1, "prescription": 2, "rx": 1, "dental": 2
+    },
+    "utilities": {
+        "electric": 2, "electricity": 2, "water": 1, "gas": 0.5, "internet": 2, "phone": 1,
+        "cable": 1, "utility": 2, "kwh": 2, "broadband": 2
+    },
+    "education": {
+        "book": 1, "books": 1, "course": 2, "tuition": 2, "school": 2, "university": 2,
+        "education": 2, "textbook": 2
+    }
+}
+
+# keyword -> [(category, weight)], for the one-pass matcher
+_KEYWORD_CATEGORIES: Dict[str, List[Tuple[str, float]]] = {}
+for _category, _keywords in CATEGORY_KEYWORDS.items():
+    for _keyword, _weight in _keywords.items():
+        _KEYWORD_CATEGORIES.setdefault(_keyword, []).append((_category, _weight))
+
+# One alternation of every keyword, longest first so "rental car" wins over "car" and
+# "gasoline" over "gas"; word boundaries keep "gas" out of "vegas" and "rx" out of "rxbar"
+_KEYWORD_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(k) for k in sorted(_KEYWORD_CATEGORIES, key=len, reverse=True)) + r")\b"
+)
+
+# One tokenizer for the amount scan. Alternatives are tried left to right at each
+# position and the scan moves past whatever matched, so a date, time or phone
+# number is consumed before its digits could be read as amounts, and "subtotal"
+# or "grand total" before the plain "total" inside them.
+_TOKEN_RE = re.compile(
+    # Dates, times, phone numbers and long ids: never amounts
+    r"(?P<skip>\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}\b"
+    r"|\d{1,2}:\d{2}(?::\d{2})?\b"
+    r"|(?:\+?\d{1,3}[\s.-]?)?\(?\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}\b"
+    r"|\d{7,})"
+    # Line labels, weighted in _LABEL_WEIGHTS
+    r"|(?P<due>(?:grand\s+total|total\s+due|amount\s+due|balance\s+due|total\s+amount|amount\s+paid|order\s+total)\b)"
+    r"|(?P<minus>(?:sub\s?-?total|tax|vat|gst|tip|gratuity|discount|savings|change|tendered|fee)\b)"
+    r"|(?P<total>total\b)"
+    r"|(?P<paid>(?:amount|balance|paid|charged|visa|mastercard|amex|card)\b)"
+    r"|(?P<meta>(?:qty|quantity|item|sku|order|invoice|receipt|table|room|store|station|tel|phone|fax|account|auth)\b|[#@])"
+    # A money amount: optional currency symbol, thousands separators, two decimals or a whole number
+    r"|(?P<currency>[$€£₹])?\s?(?<![\d.,])(?P<amount>\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+\.\d{2}|\d+)(?![\d/:%]|[.,]\d)"
+    r"|(?P<newline>\n)"
+    # Any other word is skipped whole, so labels only ever match from the start of a word
+    r"|[a-z]+"
+)
+# How a label on a line changes the chance that the line holds the total
+_LABEL_WEIGHTS = {"due": 10.0, "total": 5.0, "paid": 2.0, "minus": -4.0, "meta": -3.0}
+
+class AmountCandidate(NamedTuple):
+    value: float
+    score: float
+    line: int
+
+class ReceiptAnalysis(NamedTuple):
+    amount: float
+    category: str
+    # Candidates considered for the total, best first
+    candidates: List[AmountCandidate]
+    category_scores: Dict[str, float]
+
+def amount_candidates(text: str) -> List[AmountCandidate]:
+    """
+    Score every money amount in a receipt's text as the possible total, best first
+
+    Amounts on a line labelled as the total score highest, and those on
+    subtotal, tax, tip or change lines lowest. Amounts with cents and a
+    currency symbol score above bare integers, and later lines slightly above
+    earlier ones, since the total usually comes last. Dates, times, phone
+    numbers and long ids are never candidates.
+    """
+    text = text.lower()
+    line_count = text.count("\n") + 1
+    candidates: List[AmountCandidate] = []
+    line = 0
+    labels: set = set()
+    amounts: List[Tuple[str, bool]] = []
+    carried = 0.0
+
+    def end_line() -> float:
+        """Score the amounts of the current line; returns the label score to carry to the next one"""
+        label_score = sum(_LABEL_WEIGHTS[label] for label in labels)
+        if not amounts:
+            # A label on its own line applies to the amount printed below it
+            return 0.5 * label_score
+        position = line / line_count
+        for index, (value, currency) in enumerate(amounts):
+            amount = float(value.replace(",", ""))
+            if amount <= 0:
+                continue
+            score = label_score + carried + position
+            if "." in value:
+                score += 1.5
+            if currency:
+                score += 1.0
+            # The rightmost amount of a line is its price column
+            if index == len(amounts) - 1:
+                score += 0.5
+            candidates.append(AmountCandidate(amount, score, line))
+        return 0.0
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == "amount":
+            amounts.append((match.group("amount"), match.group("currency") is not None))
+        elif kind == "newline":
+            carried = end_line()
+            line += 1
+            labels.clear()
+            amounts.clear()
+        elif kind in _LABEL_WEIGHTS:
+            labels.add(kind)
+    end_line()
+    # Ties go to the larger amount: the total is at least every item
+    return sorted(candidates, key=lambda c: (c.score, c.value), reverse=True)
+
+def category_scores(text: str) -> Dict[str, float]:
+    """Sum the keyword weights of each category over one scan of the text"""
+    scores: Counter = Counter()
+    for match in _KEYWORD_RE.finditer(text.lower()):
+        for category, weight in _KEYWORD_CATEGORIES[match.group()]:
+            scores[category] += weight
+    return dict(scores)
+
+def analyze(text: str) -> ReceiptAnalysis:
+    """Extract the total amount and the expense category from a receipt's text"""
+    candidates = amount_candidates(text)
+    scores = category_scores(text)
+    return ReceiptAnalysis(
+        amount=candidates[0].value if candidates else 0.0,
+        category=_best_category(scores),
+        candidates=candidates,
+        category_scores=scores
+    )
+
+def extract_amount(text: str) -> float:
+    """Most likely total amount of a receipt's text, 0.0 if it has none"""
+    candidates = amount_candidates(text)
+    return candidates[0].value if candidates else 0.0
+
+def categorize_expense(text: str) -> str:
+    """Best matching expense category of a receipt's text, "other" if no keyword matches"""
+    return _best_category(category_scores(text))
+
+def _best_category(scores: Dict[str, float]) -> str:
+    if not scores:
+        return "other"
+    # Equal scores go to the category listed first in CATEGORY_KEYWORDS
+    return max(CATEGORY_KEYWORDS, key=lambda c: scores.get(c, 0.0))
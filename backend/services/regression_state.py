@@ -0,0 +1,460 @@
+import argparse
+import itertools
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, union_all
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.base import Expense, Category, CategoryRegressionState
+from services import model_registry
+from services.ml_predictor import (
+    CATEGORIES,
+    CATEGORY_INDEX,
+    FittedModel,
+    PredictionPlan,
+    feature_vector,
+    month_index,
+    predict_overspend_all,
+    solve_least_squares,
+)
+
+# State columns holding Xᵀ1 and the upper triangle of XᵀX for x = (month, days, amount)
+SUM_COLUMNS = ("sum_month", "sum_days", "sum_amount")
+PRODUCT_COLUMNS = {
+    (0, 0): "sum_month_month",
+    (0, 1): "sum_month_days",
+    (0, 2): "sum_month_amount",
+    (1, 1): "sum_days_days",
+    (1, 2): "sum_days_amount",
+    (2, 2): "sum_amount_amount",
+}
+AMOUNT = 2
+
+# Number of latest expenses averaged into the prediction point
+RECENT_WINDOW = 3
+
+# Centered second moments this small relative to the raw ones are rounding noise
+# left over from incremental updates, i.e. the feature is constant
+CONSTANT_TOLERANCE = 1e-10
+
+REBUILD_BATCH_SIZE = 10000
+
+def apply_changes(db: Session, user_id: int, changes: Sequence[tuple]) -> None:
+    """
+    Add inserted expenses to and subtract deleted expenses from the state rows
+
+    Args:
+        db: Database session (not committed here)
+        user_id: Owner of the changed expenses
+        changes: (old, new) ExpenseSnapshot pairs, either side may be None
+    """
+    signed_by_category = defaultdict(list)
+    for old, new in changes:
+        if old is not None:
+            signed_by_category[old.category].append((-1.0, old))
+        if new is not None:
+            signed_by_category[new.category].append((1.0, new))
+
+    for category, signed in signed_by_category.items():
+        first_date = _ensure_state(db, user_id, category, min(s.date for _, s in signed))
+
+        signs = np.array([sign for sign, _ in signed])
+        X = np.array([feature_vector(s.date, s.amount, first_date) for _, s in signed])
+        sums = signs @ X
+        products = (X * signs[:, None]).T @ X
+
+        values = {
+            CategoryRegressionState.count: CategoryRegressionState.count + int(signs.sum()),
+            CategoryRegressionState.version: CategoryRegressionState.version + 1,
+            CategoryRegressionState.updated_at: datetime.utcnow(),
+        }
+        for i, name in enumerate(SUM_COLUMNS):
+            column = getattr(CategoryRegressionState, name)
+            values[column] = column + float(sums[i])
+        for (i, j), name in PRODUCT_COLUMNS.items():
+            column = getattr(CategoryRegressionState, name)
+            values[column] = column + float(products[i, j])
+
+        # Relative increments, so concurrent writers never lose each other's updates
+        db.query(CategoryRegressionState).filter(
+            CategoryRegressionState.user_id == user_id,
+            CategoryRegressionState.category == category
+        ).update(values, synchronize_session=False)
+
+def _ensure_state(db: Session, user_id: int, category: Category, first_date: datetime) -> datetime:
+    """Create the state row if missing and return its first_date anchor"""
+    existing = _get_first_date(db, user_id, category)
+    if existing is not None:
+        return existing
+
+    try:
+        with db.begin_nested():
+            db.add(CategoryRegressionState(user_id=user_id, category=category, first_date=first_date, count=0, version=0))
+    except IntegrityError:
+        # Created by a concurrent transaction, use its anchor
+        pass
+
+    return _get_first_date(db, user_id, category)
+
+def _get_first_date(db: Session, user_id: int, category: Category) -> Optional[datetime]:
+    return db.query(CategoryRegressionState.first_date).filter(
+        CategoryRegressionState.user_id == user_id,
+        CategoryRegressionState.category == category
+    ).scalar()
+
+def predict_from_state(db: Session, user_id: int, category: str) -> Dict[str, Any]:
+    """
+    Predict overspend for one category from the stored regression state
+
+    Same result as ml_predictor.predict_overspend, without scanning the history.
+    """
+    return predict_all_from_state(db, user_id, [Category(category)])[category]
+
+def predict_all_from_state(
+    db: Session,
+    user_id: int,
+    categories: Optional[List[Category]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Predict overspend for several categories from the stored regression state
+
+    Args:
+        db: Database session
+        user_id: User ID to predict for
+        categories: Categories to predict (all by default)
+
+    Returns:
+        Dictionary mapping each category value to a predict_overspend result
+    """
+    categories = categories or CATEGORIES
+    try:
+        return prepare_state_prediction(db, user_id, categories).run(db)
+    except Exception as e:
+        return {
+            category.value: {
+                "predicted_overspend": 0.0,
+                "confidence": 0.0,
+                "data_points": 0,
+                "error": str(e)
+            }
+            for category in categories
+        }
+
+def prepare_state_prediction(
+    db: Session,
+    user_id: int,
+    categories: Optional[List[Category]] = None,
+    commit: bool = True
+) -> PredictionPlan:
+    """
+    Load everything a state-based prediction needs from the database
+
+    Models are served from the model registry while the data version of
+    their series is unchanged. The other series are solved from one state row
+    plus the latest expenses of the category and then stored, so the cost
+    never depends on the length of the history.
+
+    Args:
+        db: Database session
+        user_id: User ID to predict for
+        categories: Categories to predict (all by default)
+        commit: Commit the stored models; False leaves them in the caller's transaction
+
+    Returns:
+        Plan whose compute step solves the regressions that are not stored
+    """
+    categories = categories or CATEGORIES
+    states = {
+        state.category: state
+        for state in db.query(CategoryRegressionState).filter(
+            CategoryRegressionState.user_id == user_id,
+            CategoryRegressionState.category.in_(categories)
+        )
+    }
+    results = {
+        category.value: {
+            "predicted_overspend": 0.0,
+            "confidence": 0.0,
+            "data_points": states[category].count if category in states else 0,
+            "message": "Insufficient historical data"
+        }
+        for category in categories
+    }
+
+    versions = {
+        category: states[category].version
+        for category in categories
+        if category in states and states[category].count >= 3
+    }
+    if not versions:
+        return PredictionPlan(results)
+
+    models = model_registry.get_models(db, user_id, versions)
+    for category, model in models.items():
+        results[category.value] = model.predict()
+
+    missing = [states[category] for category in versions if category not in models]
+    recent = _recent_expenses(db, user_id, [state.category for state in missing])
+    missing = [state for state in missing if recent.get(state.category)]
+    if not missing:
+        return PredictionPlan(results)
+
+    # Plain values only, the state rows expire when the registry commits
+    series = [
+        (
+            state.category,
+            state.first_date,
+            recent[state.category][0][0],
+            float(np.mean([amount for _, amount in recent[state.category]])),
+            state.count
+        )
+        for state in missing
+    ]
+
+    def finish(db: Session, output: tuple) -> Dict[str, Dict[str, Any]]:
+        coef, intercept, r2 = output
+        fitted = {
+            category: FittedModel(
+                coef=[float(value) for value in coef[i]],
+                intercept=float(intercept[i]),
+                r2=float(r2[i]),
+                first_date=first_date,
+                last_date=last_date,
+                recent_average=recent_average,
+                data_points=count
+            )
+            for i, (category, first_date, last_date, recent_average, count) in enumerate(series)
+        }
+        for category, model in fitted.items():
+            results[category.value] = model.predict()
+
+        try:
+            model_registry.save_models(db, user_id, fitted, versions, commit=commit)
+        except SQLAlchemyError:
+            if not commit:
+                # The transaction is the caller's to roll back
+                raise
+            # Serving the prediction matters more than persisting the model
+            db.rollback()
+        return results
+
+    return PredictionPlan(results, solve_least_squares, centered_moments(missing), finish)
+
+def centered_moments(states: List[CategoryRegressionState]) -> tuple:
+    """
+    Convert stored raw sums into the centered cross-products used by the solver
+
+    Returns:
+        Tuple of (x_mean, y_mean, xtx, xty, yty) stacked over the given states
+    """
+    n = np.array([state.count for state in states], dtype=np.float64)
+    sums = np.array([[getattr(state, name) for name in SUM_COLUMNS] for state in states])
+    products = np.zeros((len(states), 3, 3))
+    for (i, j), name in PRODUCT_COLUMNS.items():
+        products[:, i, j] = products[:, j, i] = [getattr(state, name) for state in states]
+
+    x_mean = sums / n[:, None]
+    xtx = products - n[:, None, None] * x_mean[:, :, None] * x_mean[:, None, :]
+
+    # Drop the cancellation noise of constant features
+    raw_diagonal = np.diagonal(products, axis1=1, axis2=2)
+    constant = np.diagonal(xtx, axis1=1, axis2=2) <= CONSTANT_TOLERANCE * np.maximum(raw_diagonal, 1.0)
+    xtx[constant[:, :, None] | constant[:, None, :]] = 0.0
+
+    # The target is the amount feature
+    y_mean = x_mean[:, AMOUNT]
+    xty = xtx[:, :, AMOUNT].copy()
+    yty = xtx[:, AMOUNT, AMOUNT].copy()
+
+    return x_mean, y_mean, xtx, xty, yty
+
+def _recent_expenses(db: Session, user_id: int, categories: List[Category]) -> Dict[Category, list]:
+    """Latest (date, amount) pairs per category, newest first, in one round trip"""
+    if not categories:
+        return {}
+
+    latest = [
+        select(Expense.category, Expense.date, Expense.amount).where(
+            Expense.user_id == user_id,
+            Expense.category == category,
+            Expense.date.isnot(None)
+        ).order_by(Expense.date.desc(), Expense.id.desc()).limit(RECENT_WINDOW).subquery()
+        for category in categories
+    ]
+    rows = db.execute(union_all(*[select(subquery) for subquery in latest])).all()
+
+    recent = defaultdict(list)
+    for category, date, amount in rows:
+        recent[category].append((date, amount))
+    for pairs in recent.values():
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+    return recent
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the regression state from the expenses table and commit
+
+    Args:
+        db: Database session
+        user_id: Only rebuild this user's state (all users by default)
+
+    Returns:
+        Number of state rows written
+    """
+    state_query = db.query(CategoryRegressionState)
+    expense_query = db.query(Expense.user_id, Expense.category, Expense.date, Expense.amount).filter(
+        Expense.user_id.isnot(None),
+        Expense.date.isnot(None)
+    )
+    if user_id is not None:
+        state_query = state_query.filter(CategoryRegressionState.user_id == user_id)
+        expense_query = expense_query.filter(Expense.user_id == user_id)
+
+    # Rebuilt series get a new data version so stored models are refitted
+    previous = {
+        (uid, category): (version, first_date)
+        for uid, category, version, first_date in state_query.with_entities(
+            CategoryRegressionState.user_id,
+            CategoryRegressionState.category,
+            CategoryRegressionState.version,
+            CategoryRegressionState.first_date
+        )
+    }
+    state_query.delete(synchronize_session=False)
+
+    written = 0
+    rows = expense_query.order_by(Expense.user_id).yield_per(REBUILD_BATCH_SIZE)
+    for uid, user_rows in itertools.groupby(rows, key=lambda row: row.user_id):
+        states = compute_states(uid, list(user_rows))
+        for state in states:
+            version, _ = previous.pop((uid, state.category), (0, None))
+            state.version = version + 1
+        db.add_all(states)
+        written += len(states)
+
+    # Series left without expenses keep an empty row, so their version never
+    # restarts at a value a stored model or prediction was computed for
+    for (uid, category), (version, first_date) in previous.items():
+        db.add(CategoryRegressionState(
+            user_id=uid,
+            category=category,
+            first_date=first_date,
+            count=0,
+            version=version + 1,
+            updated_at=datetime.utcnow(),
+            **{name: 0.0 for name in (*SUM_COLUMNS, *PRODUCT_COLUMNS.values())}
+        ))
+        written += 1
+
+    db.commit()
+    return written
+
+def compute_states(user_id: int, rows: list) -> List[CategoryRegressionState]:
+    """Build the state rows of one user from (user_id, category, date, amount) rows"""
+    groups = np.array([CATEGORY_INDEX[row.category] for row in rows], dtype=np.int64)
+    dates = np.array([row.date for row in rows], dtype="datetime64[us]")
+    amounts = np.array([row.amount for row in rows], dtype=np.float64)
+
+    order = np.lexsort((dates, groups))
+    groups, dates, amounts = groups[order], dates[order], amounts[order]
+
+    n_groups = len(CATEGORIES)
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.searchsorted(groups, np.arange(n_groups), side="left")
+
+    X = np.column_stack([
+        month_index(dates),
+        (dates - dates[starts[groups]]) // np.timedelta64(1, "D"),
+        amounts
+    ]).astype(np.float64)
+    sums = np.zeros((n_groups, 3))
+    np.add.at(sums, groups, X)
+    products = np.zeros((n_groups, 3, 3))
+    np.add.at(products, groups, X[:, :, None] * X[:, None, :])
+
+    states = []
+    for group in np.flatnonzero(counts):
+        state = CategoryRegressionState(
+            user_id=user_id,
+            category=CATEGORIES[group],
+            first_date=dates[starts[group]].item(),
+            count=int(counts[group]),
+            updated_at=datetime.utcnow()
+        )
+        for i, name in enumerate(SUM_COLUMNS):
+            setattr(state, name, float(sums[group, i]))
+        for (i, j), name in PRODUCT_COLUMNS.items():
+            setattr(state, name, float(products[group, i, j]))
+        states.append(state)
+
+    return states
+
+def check_consistency(db: Session, user_id: Optional[int] = None, tolerance: float = 0.01) -> List[Dict[str, Any]]:
+    """
+    Compare state-based predictions with a full refit from the expense history
+
+    Args:
+        db: Database session
+        user_id: Only check this user (all users with expenses by default)
+        tolerance: Largest accepted absolute difference per result field
+
+    Returns:
+        List of mismatches, empty when the state is consistent
+    """
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [uid for (uid,) in db.query(Expense.user_id).filter(Expense.user_id.isnot(None)).distinct()]
+
+    mismatches = []
+    for uid in user_ids:
+        expected = predict_overspend_all(db, uid)
+        actual = predict_all_from_state(db, uid)
+        for category, refit in expected.items():
+            for field in ("data_points", "predicted_overspend", "confidence"):
+                difference = abs(refit.get(field, 0.0) - actual[category].get(field, 0.0))
+                if difference > tolerance:
+                    mismatches.append({
+                        "user_id": uid,
+                        "category": category,
+                        "field": field,
+                        "refit": refit.get(field),
+                        "state": actual[category].get(field)
+                    })
+    return mismatches
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m services.regression_state {rebuild,check}"""
+    parser = argparse.ArgumentParser(description="Maintain the incremental overspend regression state")
+    parser.add_argument("command", choices=["rebuild", "check"], help="rebuild the state from expenses or check it against a full refit")
+    parser.add_argument("--user-id", type=int, default=None, help="only process this user")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="accepted difference for check")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild(db, args.user_id)
+            print(f"Rebuilt {written} regression state rows")
+            return 0
+
+        mismatches = check_consistency(db, args.user_id, args.tolerance)
+        for mismatch in mismatches:
+            print(
+                f"user {mismatch['user_id']} {mismatch['category']} {mismatch['field']}: "
+                f"refit={mismatch['refit']} state={mismatch['state']}"
+            )
+        print(f"{len(mismatches)} inconsistent predictions")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
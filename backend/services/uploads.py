@@ -0,0 +1,191 @@
+import os
+from collections import deque
+from typing import AsyncIterator, Deque, List, NamedTuple, Optional
+
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+# Largest accepted receipt image in bytes
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", str(5 * 1024 * 1024)))
+# Multipart boundaries and part headers around each file
+MULTIPART_OVERHEAD = 16 * 1024
+# Largest accepted non-file form field
+MAX_FIELD_SIZE = 64 * 1024
+
+class UploadError(ValueError):
+    """Malformed upload, mapped to 400 by the routers"""
+    status_code = 400
+
+class UploadTooLarge(UploadError):
+    """Upload over the size limit, mapped to 413 by the routers"""
+    status_code = 413
+
+class UploadedFile(NamedTuple):
+    """A file part read fully into memory"""
+    field_name: str
+    filename: str
+    content_type: str
+    data: bytes
+
+class _PartCollector:
+    """python-multipart callbacks that buffer file parts and enforce the limits"""
+
+    def __init__(self, max_file_size: int, max_files: int):
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+        self.completed: Deque[UploadedFile] = deque()
+        self.files = 0
+        self._is_file = False
+        self._header_name = b""
+        self._header_value = b""
+        self._headers = {}
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._chunks = []
+        self._size = 0
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise UploadError('Every form part needs a Content-Disposition "name"')
+        self._is_file = b"filename" in options
+        if self._is_file:
+            self.files += 1
+            if self.files > self.max_files:
+                raise UploadError(f"At most {self.max_files} files can be uploaded at once")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._size += end - start
+        if self._is_file and self._size > self.max_file_size:
+            raise UploadTooLarge(f"File size must be less than {self.max_file_size // (1024 * 1024)}MB")
+        if not self._is_file and self._size > MAX_FIELD_SIZE:
+            raise UploadTooLarge("Form field too large")
+        self._chunks.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if not self._is_file:
+            return
+        _, options = parse_options_header(self._headers[b"content-disposition"])
+        self.completed.append(UploadedFile(
+            field_name=options[b"name"].decode("utf-8", "replace"),
+            filename=options[b"filename"].decode("utf-8", "replace"),
+            content_type=self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1"),
+            # One join per file; the parts are never written to disk
+            data=b"".join(self._chunks)
+        ))
+        self._chunks = []
+
+async def iter_upload_files(
+    request: Request,
+    max_file_size: int = MAX_FILE_SIZE,
+    max_files: int = 1
+) -> AsyncIterator[UploadedFile]:
+    """
+    Stream a multipart/form-data request body, yielding each file as soon as it is complete
+
+    The body is parsed while it arrives, so a request over the limits is
+    rejected before the rest of it is read, and nothing is spooled to disk.
+    Non-file fields are skipped.
+
+    Args:
+        request: Incoming request whose body has not been read
+        max_file_size: Largest accepted file in bytes
+        max_files: Largest accepted number of files
+
+    Raises:
+        UploadError: The body is not valid multipart/form-data
+        UploadTooLarge: A file or the declared Content-Length is over the limit
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    # Reject oversized uploads before reading any of the body
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_files * (max_file_size + MULTIPART_OVERHEAD):
+            raise UploadTooLarge(f"File size must be less than {max_file_size // (1024 * 1024)}MB")
+
+    collector = _PartCollector(max_file_size, max_files)
+    parser = multipart.MultipartParser(params[b"boundary"], collector.callbacks())
+    async for chunk in request.stream():
+        try:
+            parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Invalid multipart/form-data body: {e}")
+        while collector.completed:
+            yield collector.completed.popleft()
+    try:
+        parser.finalize()
+    except MultipartParseError as e:
+        raise UploadError(f"Invalid multipart/form-data body: {e}")
+    while collector.completed:
+        yield collector.completed.popleft()
+
+async def read_upload_file(request: Request, max_file_size: int = MAX_FILE_SIZE) -> UploadedFile:
+    """Read the single file of a multipart/form-data request (see iter_upload_files)"""
+    upload: Optional[UploadedFile] = None
+    async for upload in iter_upload_files(request, max_file_size, max_files=1):
+        pass
+    if upload is None:
+        raise UploadError("No file uploaded")
+    return upload
+
+# OpenAPI request body of routes that read their upload with read_upload_file
+UPLOAD_FILE_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+# OpenAPI request body of routes that read several uploads with iter_upload_files
+UPLOAD_FILES_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}}
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,78 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.base import User
+from services.cache import LRUCache
+
+# Authenticated users kept in process memory, keyed by token subject (email)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+# Upper bound on how long another worker process may serve a changed profile
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+class CachedUser(NamedTuple):
+    """Immutable copy of a user row that is safe to share across sessions"""
+    id: int
+    email: str
+    first_name: str
+    last_name: str
+    mobile_number: Optional[str]
+    created_at: Optional[datetime]
+
+async def get_user(db: AsyncSession, email: str) -> Optional[CachedUser]:
+    """
+    Resolve a token subject to its user, querying the users table only on a miss
+
+    Args:
+        db: Async database session
+        email: Subject claim of the access token
+
+    Returns:
+        The cached user, or None if no user has this email
+    """
+    user = _cache.get(email)
+    if user is not None:
+        return user
+
+    row = (await db.execute(select(User).where(User.email == email))).scalars().first()
+    if row is None:
+        return None
+    user = CachedUser(row.id, row.email, row.first_name, row.last_name, row.mobile_number, row.created_at)
+    _cache.set(email, user)
+    return user
+
+def invalidate(email: str) -> None:
+    """Drop a user from the cache"""
+    _cache.pop(email)
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+def clear_cache() -> None:
+    _cache.clear()
+
+# ORM updates and deletes of users invalidate their entries when flushed, and again after
+# commit so a request racing the transaction cannot leave the old row cached.
+# Bulk query().update()/delete() bypass these events and rely on USER_CACHE_TTL.
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault("changed_user_emails", set()).update(emails)
+    for email in emails:
+        invalidate(email)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for email in session.info.pop("changed_user_emails", ()):
+        invalidate(email)
+
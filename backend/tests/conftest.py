@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# database.py reads DATABASE_URL at import; tests run on a throwaway SQLite file
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+
+import pytest
+
+@pytest.fixture
+def db():
+    """Session on freshly created tables holding one user"""
+    from database import SessionLocal, engine
+    from models.base import Base, User
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    session.add(User(email="test@example.com", first_name="Test", last_name="User"))
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from crud.expenses import expense_crud
+from models.base import Category, CategoryRegressionState, ExpenseMonthlyRollup, User
+from routers.expenses import ExpenseCreate
+
+def test_offset_dates_are_stored_as_naive_utc(db):
+    expense = ExpenseCreate(amount=12.5, category="food", date="2024-06-01T22:30:00+02:00")
+    assert expense.date == datetime(2024, 6, 1, 20, 30)
+
+def state_of(db, category):
+    return db.query(CategoryRegressionState).filter(CategoryRegressionState.category == category).one()
+
+def rollup_of(db, category):
+    return [
+        (row.year, row.month, row.total, row.count)
+        for row in db.query(ExpenseMonthlyRollup).filter(ExpenseMonthlyRollup.category == category)
+    ]
+
+def test_frontend_dates_update_the_derived_tables(db):
+    user_id = db.query(User).one().id
+    # The frontend sends toISOString() dates; the regression state compares them
+    # with the naive dates already stored, which failed for aware datetimes
+    for day in range(1, 5):
+        expense = ExpenseCreate(amount=10.0 * day, category="food", date=f"2024-06-0{day}T12:00:00.000Z")
+        created = expense_crud.create(db, user_id, expense.model_dump())
+        assert created.date == datetime(2024, 6, day, 12)
+
+    state = state_of(db, Category.FOOD)
+    assert state.first_date == datetime(2024, 6, 1, 12)
+    assert state.count == 4
+    assert state.version == 4
+    # x = (month, days since first_date, amount) summed over the four expenses
+    assert state.sum_month == pytest.approx(24.0)
+    assert state.sum_days == pytest.approx(0.0 + 1 + 2 + 3)
+    assert state.sum_amount == pytest.approx(100.0)
+    assert state.sum_days_amount == pytest.approx(1 * 20.0 + 2 * 30.0 + 3 * 40.0)
+    assert state.sum_amount_amount == pytest.approx(100.0 + 400 + 900 + 1600)
+    assert rollup_of(db, Category.FOOD) == [(2024, 6, pytest.approx(100.0), 4)]
+
+def test_expenses_without_a_date_update_the_derived_tables(db):
+    user_id = db.query(User).one().id
+    before = datetime.utcnow()
+    expense = ExpenseCreate(amount=25.0, category="travel")
+    created = expense_crud.create(db, user_id, expense.model_dump())
+    assert created.date >= before
+
+    state = state_of(db, Category.TRAVEL)
+    assert state.count == 1
+    assert state.version == 1
+    assert state.sum_amount == pytest.approx(25.0)
+    assert rollup_of(db, Category.TRAVEL) == [(created.date.year, created.date.month, pytest.approx(25.0), 1)]
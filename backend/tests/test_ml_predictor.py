@@ -0,0 +1,97 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.base import Category, Expense, User
+from services.ml_predictor import fit_linear_regressions, predict_overspend, predict_overspend_all
+
+# The reference implementation fits scikit-learn's LinearRegression per category
+pytest.importorskip("sklearn")
+
+def test_fit_linear_regressions_matches_linear_regression():
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import r2_score
+
+    rng = np.random.default_rng(7)
+    series = [
+        # Full rank with an unrelated target, so the fit is not trivial
+        rng.normal(size=(40, 3)) * [3.0, 50.0, 20.0] + [6.0, 100.0, 40.0],
+        rng.normal(size=(12, 3)),
+        # Rank deficient: a constant feature and a duplicated one
+        np.column_stack([np.full(9, 4.0), np.arange(9.0), np.arange(9.0) * 2]),
+        # Fewer than 3 points: the minimum-norm solution
+        rng.normal(size=(2, 3)),
+        rng.normal(size=(1, 3)),
+    ]
+    targets = [rng.normal(50, 10, size=len(X)) + X @ [1.5, -0.2, 0.7] for X in series]
+    groups = np.concatenate([np.full(len(X), g) for g, X in enumerate(series)])
+
+    coef, intercept, r2 = fit_linear_regressions(groups, np.vstack(series), np.concatenate(targets), len(series))
+
+    for g, (X, y) in enumerate(zip(series, targets)):
+        model = LinearRegression().fit(X, y)
+        points = rng.normal(size=(5, 3)) * 10
+        assert points @ coef[g] + intercept[g] == pytest.approx(model.predict(points), rel=1e-6, abs=1e-6), g
+        if len(X) >= 3:
+            assert r2[g] == pytest.approx(r2_score(y, model.predict(X)), abs=1e-9), g
+
+def add_expenses(db, user_id, category, dated_amounts):
+    db.add_all([
+        Expense(user_id=user_id, category=category, date=date, amount=amount)
+        for date, amount in dated_amounts
+    ])
+
+@pytest.fixture
+def user_id(db):
+    user_id = db.query(User).one().id
+    rng = random.Random(3)
+    start = datetime(2025, 1, 3, 9, 30)
+
+    # Full rank: expenses spread over many months with noisy amounts
+    add_expenses(db, user_id, Category.FOOD, [
+        (start + timedelta(days=4 * i, hours=rng.randint(0, 12)), round(20 + 0.3 * i + rng.uniform(-5, 5), 2))
+        for i in range(60)
+    ])
+    add_expenses(db, user_id, Category.SHOPPING, [
+        (start + timedelta(days=rng.randint(0, 400)), round(rng.uniform(5, 500), 2))
+        for _ in range(25)
+    ])
+    # Rank deficient: one day, so month and days are constant features
+    add_expenses(db, user_id, Category.TRAVEL, [
+        (datetime(2025, 6, 1, 12), amount) for amount in (120.0, 80.0, 310.5, 42.0)
+    ])
+    # Rank deficient: every feature constant, including the amount
+    add_expenses(db, user_id, Category.UTILITIES, [
+        (datetime(2025, 3, 15), 60.0) for _ in range(5)
+    ])
+    # Fewer than 3 points
+    add_expenses(db, user_id, Category.ENTERTAINMENT, [
+        (datetime(2025, 2, 1), 15.0), (datetime(2025, 2, 9), 22.0)
+    ])
+    db.commit()
+    return user_id
+
+def test_batched_solve_matches_linear_regression(db, user_id):
+    batched = predict_overspend_all(db, user_id)
+
+    for category in Category:
+        reference = predict_overspend(db, user_id, category.value)
+        result = batched[category.value]
+        assert "error" not in reference and "error" not in result, category
+        assert result["data_points"] == reference["data_points"], category
+        assert result.get("message") == reference.get("message"), category
+        for field in ("predicted_overspend", "prediction", "recent_average"):
+            assert result.get(field) == pytest.approx(reference.get(field), abs=0.011), (category, field)
+        assert result["confidence"] == pytest.approx(reference["confidence"], abs=0.0011), category
+
+def test_insufficient_and_degenerate_series(db, user_id):
+    batched = predict_overspend_all(db, user_id)
+
+    assert batched["entertainment"]["message"] == "Insufficient historical data"
+    assert batched["entertainment"]["data_points"] == 2
+    assert batched["education"]["data_points"] == 0
+    # A constant series is fitted exactly and predicts its own amount
+    assert batched["utilities"]["prediction"] == pytest.approx(60.0)
+    assert batched["utilities"]["predicted_overspend"] == 0.0
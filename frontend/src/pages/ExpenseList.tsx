@@ -5,11 +5,13 @@ import type { Expense } from '../store/api'
 
 const ExpenseList: React.FC = () => {
   const [page, setPage] = useState(1)
+  // cursors[i] is the cursor that loads page i + 1 (page 1 has none)
+  const [cursors, setCursors] = useState<(string | undefined)[]>([undefined])
   const [selectedCategory, setSelectedCategory] = useState('')
   const [searchTerm, setSearchTerm] = useState('')
   
   const { data: expenses, isLoading, error } = useGetExpensesQuery({
-    page,
+    cursor: cursors[page - 1],
     limit: 20,
     category: selectedCategory || undefined,
     search: searchTerm || undefined,
@@ -126,7 +128,11 @@ const ExpenseList: React.FC = () => {
               </label>
               <select
                 value={selectedCategory}
-                onChange={(e) => setSelectedCategory(e.target.value)}
+                onChange={(e) => {
+                  setSelectedCategory(e.target.value)
+                  setPage(1)
+                  setCursors([undefined])
+                }}
                 className="input"
               >
                 <option value="">All Categories</option>
@@ -144,6 +150,7 @@ const ExpenseList: React.FC = () => {
                   setSearchTerm('')
                   setSelectedCategory('')
                   setPage(1)
+                  setCursors([undefined])
                 }}
                 className="btn btn-secondary w-full"
               >
@@ -240,11 +247,11 @@ const ExpenseList: React.FC = () => {
           </div>
 
           {/* Pagination */}
-          {expenses && expenses.total > 20 && (
+          {expenses && (page > 1 || expenses.nextCursor) && (
             <div className="px-6 py-4 border-t border-gray-200">
               <div className="flex items-center justify-between">
                 <div className="text-sm text-gray-700">
-                  Showing {((page - 1) * 20) + 1} to {Math.min(page * 20, expenses.total)} of {expenses.total} results
+                  Showing {((page - 1) * 20) + 1} to {((page - 1) * 20) + expenses.total} results
                 </div>
                 <div className="flex space-x-2">
                   <button
@@ -255,8 +262,11 @@ const ExpenseList: React.FC = () => {
                     Previous
                   </button>
                   <button
-                    onClick={() => setPage(page + 1)}
-                    disabled={page * 20 >= expenses.total}
+                    onClick={() => {
+                      setCursors([...cursors.slice(0, page), expenses.nextCursor ?? undefined])
+                      setPage(page + 1)
+                    }}
+                    disabled={!expenses.nextCursor}
                     className="btn btn-secondary disabled:opacity-50 disabled:cursor-not-allowed"
                   >
                     Next
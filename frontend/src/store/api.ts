@@ -133,16 +133,17 @@ export const api = createApi({
     }),
     
     // Expense endpoints
-    getExpenses: builder.query<{ items: Expense[]; total: number }, { page?: number; limit?: number; category?: string; startDate?: string; endDate?: string; search?: string }>({
+    getExpenses: builder.query<{ items: Expense[]; total: number; nextCursor: string | null }, { cursor?: string; limit?: number; category?: string; startDate?: string; endDate?: string; search?: string }>({
       query: (params) => ({
         url: 'expenses',
         params,
       }),
       providesTags: ['Expense'],
-      transformResponse: (response: Expense[]) => {
+      transformResponse: (response: Expense[], meta) => {
         return {
           items: response,
-          total: response.length
+          total: response.length,
+          nextCursor: meta?.response?.headers.get('X-Next-Cursor') ?? null
         }
       }
     }),